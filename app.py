@@ -1,12 +1,16 @@
 import streamlit as st
 import json
 import uuid
+import secrets
 import os
 import boto3
 from dotenv import load_dotenv
 from datetime import datetime
 import time
+import io
 from botocore.config import Config
+from audit_jobs import AuditJob, JobQueue, run_audit
+from image_preprocess import DEFAULT_CONFIG as PREPROCESS_DEFAULTS, is_image
 
 # Page Configuration
 st.set_page_config(
@@ -108,13 +112,18 @@ boto_config = Config(
 s3_client = boto3.client('s3', region_name=AWS_DEFAULT_REGION, config=boto_config)
 bedrock_agent_client = boto3.client('bedrock-agent-runtime', region_name=AWS_DEFAULT_REGION, config=boto_config)
 # Session state
-if 'processing_time' not in st.session_state:
-    st.session_state.processing_time = None
+# Audit jobs belong to an owner token kept in the URL, so a refresh keeps them but
+# other browser sessions of this process never see them
+if 'owner' not in st.query_params:
+    st.query_params['owner'] = secrets.token_urlsafe(16)
+job_owner = st.query_params['owner']
+if 'open_job' not in st.session_state:
+    st.session_state.open_job = None
 
 # --- Helper Functions ---
 
-def invoke_bedrock_agent(file_keys: list) -> tuple:
-    """Invokes the Bedrock Agent and returns (response, processing_time)"""
+def invoke_bedrock_agent(file_keys: list, on_chunk=None) -> tuple:
+    """Invokes the Bedrock Agent and returns (response, processing_time). on_chunk(chars_received) reports streaming progress."""
     start_time = time.time()
     
     try:
@@ -141,6 +150,8 @@ Extract data from each file, analyze for fraud indicators, verify IRCC complianc
             chunk = event.get('chunk', {})
             if 'bytes' in chunk:
                 completion += chunk['bytes'].decode('utf-8')
+                if on_chunk:
+                    on_chunk(len(completion))
         
         processing_time = time.time() - start_time
         
@@ -149,6 +160,118 @@ Extract data from each file, analyze for fraud indicators, verify IRCC complianc
     except Exception as e:
         return (f"ERROR: {str(e)}", time.time() - start_time)
 
+AUDIT_STAGES = ['preprocess', 'upload', 'analysis', 'report']
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """One job queue per Streamlit process, shared by every rerun and browser session."""
+    return JobQueue(max_workers=int(os.getenv('OPENOMI_AUDIT_WORKERS', '3')))
+
+def upload_to_s3(file_name: str, file_bytes: bytes) -> str:
+    """Uploads one document to the audit bucket and returns its S3 key"""
+    file_key = f"audit-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}-{file_name}"
+    s3_client.upload_fileobj(io.BytesIO(file_bytes), BUCKET_NAME, file_key)
+    return file_key
+
+def run_audit_job(job: AuditJob, files: list, program_code: str, family_size: int, preprocess_config: dict) -> dict:
+    """Runs one audit in a worker thread (see audit_jobs.run_audit) against S3 and the Bedrock Agent."""
+    return run_audit(
+        job, files, program_code, programs[program_code], family_size, preprocess_config,
+        upload_file=upload_to_s3,
+        invoke_agent=invoke_bedrock_agent
+    )
+
+def render_report(job_id: str, report_data: dict):
+    """Verdict banner, metrics, full report and exports of a finished audit."""
+    verdict = report_data['verdict']
+    if verdict == "APPROVED":
+        st.markdown(f'<div class="verdict-approved">VERDICT: APPROVED</div>', unsafe_allow_html=True)
+    elif verdict == "REJECTED":
+        st.markdown(f'<div class="verdict-rejected">VERDICT: REJECTED</div>', unsafe_allow_html=True)
+    else:
+        st.markdown(f'<div class="verdict-review">VERDICT: NEEDS REVIEW</div>', unsafe_allow_html=True)
+
+    processing_time = report_data['processing_time_seconds']
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Documents", report_data['files_analyzed'])
+    with col2:
+        st.metric("Processing Time", f"{processing_time:.1f}s")
+    with col3:
+        st.metric("Red Flags", report_data['red_flags_detected'])
+    with col4:
+        time_saved_hours = (2.5 * 3600 - processing_time) / 3600  # Assuming 2.5 hours manual review
+        st.metric("Time Saved", f"{time_saved_hours:.1f}h")
+
+    st.markdown("### Complete Audit Report")
+    st.markdown(report_data['report'])
+
+    stamp = datetime.fromisoformat(report_data['timestamp']).strftime('%Y%m%d_%H%M%S')
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "Download Report (JSON)",
+            data=json.dumps(report_data, indent=2),
+            file_name=f"openomi_audit_{stamp}.json",
+            mime="application/json",
+            key=f"json-{job_id}"
+        )
+    with col2:
+        st.download_button(
+            "Download Report (TXT)",
+            data=report_data['report'],
+            file_name=f"openomi_audit_{stamp}.txt",
+            mime="text/plain",
+            key=f"txt-{job_id}"
+        )
+
+@st.fragment(run_every=2)
+def render_job_panel():
+    """
+    Lists this owner's audit jobs and their progress; refreshes itself while the rest of the page
+    stays put. Reports are rendered outside the fragment, only for the job that is opened.
+    """
+    jobs = job_queue.jobs(job_owner)
+    if not jobs:
+        st.info("No audits yet. Submitted audits run in the background and appear here.")
+        return
+
+    status_labels = {'queued': 'QUEUED', 'running': 'RUNNING', 'done': 'DONE', 'failed': 'FAILED'}
+    for job in jobs:
+        state = job.snapshot()
+        title = f"[{status_labels[state['status']]}] Job {state['id']} - {state['label']} - {job.elapsed:.0f}s"
+        with st.expander(title, expanded=state['status'] in ('queued', 'running')):
+            for name, stage in state['stages'].items():
+                st.progress(stage['progress'], text=f"{name.capitalize()}: {stage['detail'] or stage['status']}")
+            if state['status'] == 'failed':
+                st.error(f"Audit failed: {state['error']}")
+            col1, col2 = st.columns(2)
+            with col1:
+                if state['status'] == 'done' and st.button("Open report", key=f"open-{state['id']}"):
+                    st.session_state.open_job = state['id']
+                    st.rerun()
+            with col2:
+                if state['status'] in ('done', 'failed') and st.button("Dismiss", key=f"dismiss-{state['id']}"):
+                    job_queue.remove(state['id'], job_owner)
+                    if st.session_state.open_job == state['id']:
+                        st.session_state.open_job = None
+                        st.rerun()
+                    st.rerun(scope="fragment")
+
+def render_open_report():
+    """The report of the opened job, rendered once per page run instead of on every panel refresh."""
+    job = job_queue.get(st.session_state.open_job, job_owner) if st.session_state.open_job else None
+    if job is None:
+        return
+    state = job.snapshot()
+    if state['status'] != 'done':
+        return
+    st.subheader(f"Audit Report - Job {state['id']}")
+    st.caption(state['label'])
+    render_report(state['id'], state['result'])
+
+job_queue = get_job_queue()
+
 # Header
 st.markdown('<div class="main-header">OPENOMI</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-header">AI-Powered Financial Fraud Detection (Immigration case)</div>', unsafe_allow_html=True)
@@ -282,8 +405,32 @@ uploaded_files = st.file_uploader(
     help="Upload 6 months of consecutive bank statements"
 )
 
+# Image pre-processing settings (phone photos are shrunk before upload)
+with st.sidebar:
+    st.subheader("Image Pre-processing")
+    preprocess_config = {
+        'enabled': st.checkbox(
+            "Optimize images before upload",
+            value=PREPROCESS_DEFAULTS['enabled'],
+            help="Strip EXIF, re-encode and shrink very large JPG/PNG scans. PDFs are uploaded as-is."
+        ),
+        'max_long_side': st.slider(
+            "Max image size (px, long side)", min_value=2000, max_value=6000,
+            value=PREPROCESS_DEFAULTS['max_long_side'], step=100,
+            help="Only larger images are down-sampled. Lower values risk hurting extraction accuracy."
+        ),
+        'grayscale': st.checkbox("Convert to grayscale", value=PREPROCESS_DEFAULTS['grayscale']),
+        'combine_pdf': st.checkbox(
+            "Combine page images into one PDF",
+            value=PREPROCESS_DEFAULTS['combine_pdf'],
+            help="Useful when each page of a statement was photographed separately."
+        ),
+    }
+
 if uploaded_files:
     st.success(f"{len(uploaded_files)} file(s) ready for analysis")
+    if preprocess_config['enabled'] and any(is_image(file.name) for file in uploaded_files):
+        st.caption("Images will be optimized in the background before upload.")
     
     # Show file list
     for idx, file in enumerate(uploaded_files, 1):
@@ -301,117 +448,27 @@ with col2:
         disabled=not uploaded_files
     )
 
-# Processing
+# Submit the audit to the background queue; the job panel below tracks it
 if analyze_button and uploaded_files:
-    
-    # Phase 1: Upload
-    st.markdown("---")
-    st.subheader("Phase 1: Secure Upload")
-    
-    progress_bar = st.progress(0)
-    uploaded_keys = []
-    
-    try:
-        for idx, file in enumerate(uploaded_files):
-            file_key = f"audit-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}-{file.name}"
-            file.seek(0)
-            s3_client.upload_fileobj(file, BUCKET_NAME, file_key)
-            uploaded_keys.append(file_key)
-            progress_bar.progress((idx + 1) / len(uploaded_files))
-        
-        st.success(f"Uploaded {len(uploaded_keys)} documents")
-        
-    except Exception as e:
-        st.error(f"Upload error: {e}")
-        st.stop()
-    
-    # Phase 2: AI Analysis
-    st.markdown("---")
-    st.subheader("Phase 2: AI Fraud Detection & Compliance Analysis")
-    
-    with st.spinner(f"Analyzing for {programs[selected_program]}..."):
-        prompt = f"""Perform a complete IRCC financial compliance audit for the **{programs[selected_program]}** program.
-        **Program Code:** {selected_program}
-        **Family Size:** {family_size}
-        **Documents:** {json.dumps(uploaded_keys)}
-        CRITICAL: Apply the specific financial requirements and red flags for {selected_program} program, NOT generic rules.
-        Extract data from each file, verify compliance with {selected_program} requirements, detect fraud, and generate your audit report."""
-        
-        agent_response, processing_time = invoke_bedrock_agent(prompt)
-        st.session_state.processing_time = processing_time
-    
-    st.success(f"Analysis complete in {processing_time:.1f} seconds")
-    
-    # Phase 3: Results
-    st.markdown("---")
-    st.subheader("Phase 3: Audit Report")
-    
-    # Parse verdict from response
-    verdict = "NEEDS REVIEW"
-    if "APPROVED" in agent_response.upper():
-        verdict = "APPROVED"
-    elif "REJECTED" in agent_response.upper():
-        verdict = "REJECTED"
-    
-    # Show verdict banner
-    if verdict == "APPROVED":
-        st.markdown(f'<div class="verdict-approved">VERDICT: APPROVED</div>', unsafe_allow_html=True)
-    elif verdict == "REJECTED":
-        st.markdown(f'<div class="verdict-rejected">VERDICT: REJECTED</div>', unsafe_allow_html=True)
-    else:
-        st.markdown(f'<div class="verdict-review">VERDICT: NEEDS REVIEW</div>', unsafe_allow_html=True)
-    
-    st.markdown("---")
-    
-    # Metrics
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.metric("Documents", len(uploaded_keys))
-    with col2:
-        st.metric("Processing Time", f"{processing_time:.1f}s")
-    with col3:
-        red_flags = agent_response.upper().count("RED FLAG") + agent_response.upper().count("❌")
-        st.metric("Red Flags", red_flags)
-    with col4:
-        time_saved_hours = (2.5 * 3600 - processing_time) / 3600  # Assuming 2.5 hours manual review
-        st.metric("Time Saved", f"{time_saved_hours:.1f}h")
-    
-    st.markdown("---")
-    
-    # Full Report
-    st.markdown("### Complete Audit Report")
-    st.markdown(agent_response)
-    
-    st.markdown("---")
-    
-    # Export
-    st.subheader("Export Report")
-    
-    report_data = {
-        'timestamp': datetime.now().isoformat(),
-        'verdict': verdict,
-        'files_analyzed': len(uploaded_keys),
-        'processing_time_seconds': processing_time,
-        'red_flags_detected': red_flags,
-        'report': agent_response
-    }
-    
-    col1, col2 = st.columns(2)
-    with col1:
-        st.download_button(
-            "Download Report (JSON)",
-            data=json.dumps(report_data, indent=2),
-            file_name=f"openomi_audit_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json"
-        )
-    
-    with col2:
-        st.download_button(
-            "Download Report (TXT)",
-            data=agent_response,
-            file_name=f"openomi_audit_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-            mime="text/plain"
-        )
+    files = [(file.name, file.getvalue()) for file in uploaded_files]
+    job_id = job_queue.submit(
+        f"{programs[selected_program]} - family of {family_size} - {len(files)} file(s)",
+        AUDIT_STAGES,
+        run_audit_job,
+        files,
+        selected_program,
+        family_size,
+        preprocess_config,
+        owner=job_owner
+    )
+    st.success(f"Audit job {job_id} submitted. You can start another application while it runs.")
+
+st.markdown("---")
+
+# Jobs
+st.subheader("Step 3: Audit Jobs")
+render_job_panel()
+render_open_report()
 
 # Footer
 st.markdown("---")
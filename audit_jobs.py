@@ -0,0 +1,201 @@
+import json
+import queue
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+
+from image_preprocess import preprocess_files
+
+
+class AuditJob:
+    """State of one background audit. Updated by the worker thread, read by the UI."""
+
+    def __init__(self, label: str, stages: list[str], owner: str | None = None):
+        self.id = uuid.uuid4().hex[:8]
+        self.label = label
+        self.owner = owner
+        self.status = 'queued'
+        self.stages = {name: {'status': 'pending', 'progress': 0.0, 'detail': ''} for name in stages}
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def update_stage(self, name: str, progress: float | None = None, detail: str | None = None, status: str = 'running'):
+        with self._lock:
+            stage = self.stages[name]
+            stage['status'] = status
+            if progress is not None:
+                stage['progress'] = max(0.0, min(1.0, progress))
+            if detail is not None:
+                stage['detail'] = detail
+
+    def finish_stage(self, name: str, detail: str | None = None):
+        self.update_stage(name, progress=1.0, detail=detail, status='done')
+
+    def snapshot(self) -> dict:
+        """Consistent copy of the job state for rendering."""
+        with self._lock:
+            return {
+                'id': self.id,
+                'label': self.label,
+                'status': self.status,
+                'stages': {name: dict(stage) for name, stage in self.stages.items()},
+                'submitted_at': self.submitted_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'result': self.result,
+                'error': self.error,
+            }
+
+    @property
+    def elapsed(self) -> float:
+        if not self.started_at:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobQueue:
+    """
+    Process-local queue of audit jobs served by a fixed pool of worker threads.
+    `submit` returns immediately; the caller polls the job state to render progress.
+    """
+
+    def __init__(self, max_workers: int = 3, max_history: int = 50):
+        self.max_history = max_history
+        self._queue = queue.Queue()
+        self._jobs: dict[str, AuditJob] = {}
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"audit-worker-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, label: str, stages: list[str], fn, *args, owner: str | None = None, **kwargs) -> str:
+        """
+        Queues fn(job, *args, **kwargs) and returns the job id. fn's return value becomes job.result.
+        Jobs submitted with an owner are only visible to callers passing the same owner.
+        """
+        job = AuditJob(label, stages, owner)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._queue.put((job, fn, args, kwargs))
+        print(f"Queued audit job {job.id}: {label}")
+        return job.id
+
+    def get(self, job_id: str, owner: str | None = None) -> AuditJob | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job and job.owner == owner else None
+
+    def jobs(self, owner: str | None = None) -> list[AuditJob]:
+        """The owner's jobs, newest first."""
+        with self._lock:
+            owned = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(owned, key=lambda job: job.submitted_at, reverse=True)
+
+    def remove(self, job_id: str, owner: str | None = None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job.owner == owner and job.status in ('done', 'failed'):
+                del self._jobs[job_id]
+
+    def _prune(self):
+        # Drop the oldest finished jobs so a long-running app doesn't keep every report in memory
+        finished = sorted((job for job in self._jobs.values() if job.status in ('done', 'failed')),
+                          key=lambda job: job.submitted_at)
+        while len(self._jobs) > self.max_history and finished:
+            del self._jobs[finished.pop(0).id]
+
+    def _worker(self):
+        while True:
+            job, fn, args, kwargs = self._queue.get()
+            with job._lock:
+                job.status = 'running'
+                job.started_at = time.time()
+            try:
+                result = fn(job, *args, **kwargs)
+                with job._lock:
+                    job.result = result
+                    job.status = 'done'
+            except Exception as e:
+                print(f"ERROR in audit job {job.id}: {e}")
+                traceback.print_exc()
+                with job._lock:
+                    job.error = str(e)
+                    job.status = 'failed'
+                    for stage in job.stages.values():
+                        if stage['status'] == 'running':
+                            stage['status'] = 'failed'
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+
+def run_audit(job: AuditJob, files: list, program_code: str, program_name: str, family_size: int,
+              preprocess_config: dict, upload_file, invoke_agent) -> dict:
+    """
+    The audit pipeline run by the app for one application: image pre-processing, upload,
+    agent analysis, report. upload_file(file_name, file_bytes) returns the stored key and
+    invoke_agent(prompt, on_chunk=...) returns (response, processing_time).
+    """
+    # Stage 1: Pre-process scanned/photographed pages
+    original_size = sum(len(data) for _, data in files)
+    files = preprocess_files(
+        files,
+        preprocess_config,
+        on_progress=lambda done, total: job.update_stage('preprocess', done / total, f"{done}/{total} images")
+    )
+    new_size = sum(len(data) for _, data in files)
+    job.finish_stage('preprocess', f"{original_size / 1024:.0f} KB -> {new_size / 1024:.0f} KB")
+
+    # Stage 2: Upload
+    uploaded_keys = []
+    for idx, (file_name, file_bytes) in enumerate(files):
+        uploaded_keys.append(upload_file(file_name, file_bytes))
+        job.update_stage('upload', (idx + 1) / len(files), f"{idx + 1}/{len(files)} documents")
+    job.finish_stage('upload', f"Uploaded {len(uploaded_keys)} documents")
+
+    # Stage 3: AI Analysis
+    job.update_stage('analysis', detail=f"Analyzing for {program_name}...")
+    prompt = f"""Perform a complete IRCC financial compliance audit for the **{program_name}** program.
+    **Program Code:** {program_code}
+    **Family Size:** {family_size}
+    **Documents:** {json.dumps(uploaded_keys)}
+    CRITICAL: Apply the specific financial requirements and red flags for {program_code} program, NOT generic rules.
+    Extract data from each file, verify compliance with {program_code} requirements, detect fraud, and generate your audit report."""
+
+    agent_response, processing_time = invoke_agent(
+        prompt,
+        on_chunk=lambda received: job.update_stage('analysis', detail=f"Receiving report ({received} characters)")
+    )
+    if agent_response.startswith("ERROR"):
+        raise RuntimeError(agent_response)
+    job.finish_stage('analysis', f"Analysis complete in {processing_time:.1f} seconds")
+
+    # Stage 4: Report
+    verdict = "NEEDS REVIEW"
+    if "APPROVED" in agent_response.upper():
+        verdict = "APPROVED"
+    elif "REJECTED" in agent_response.upper():
+        verdict = "REJECTED"
+    red_flags = agent_response.upper().count("RED FLAG") + agent_response.upper().count("❌")
+    job.finish_stage('report', verdict)
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'program': program_code,
+        'family_size': family_size,
+        'verdict': verdict,
+        'files_analyzed': len(uploaded_keys),
+        'processing_time_seconds': processing_time,
+        'red_flags_detected': red_flags,
+        'report': agent_response
+    }
@@ -0,0 +1,99 @@
+"""
+Checks that image pre-processing does not change what LandingAI extracts.
+
+Each sample image is extracted twice through the shared engine, as uploaded and after
+image_preprocess.preprocess_image with the given settings, and the two extractions are compared:
+balances, currency and the multiset of transaction amounts must agree. Needs VISION_AGENT_API_KEY
+(it calls the real ADE service); point it at a folder of representative phone photos and scans.
+
+    python benchmarks/preprocess_accuracy.py samples/ --output preprocess_accuracy.json
+    python benchmarks/preprocess_accuracy.py samples/ --max-long-side 2500 --grayscale
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / 'src'))
+
+from image_preprocess import DEFAULT_CONFIG, is_image, preprocess_image
+
+
+def _cents(value) -> int | None:
+    try:
+        return int(round(float(value) * 100))
+    except (TypeError, ValueError):
+        return None
+
+
+def compare_extractions(original: dict, processed: dict) -> dict:
+    """Field-level agreement between two extractions of the same document."""
+    fields = {
+        name: _cents(original.get(name)) == _cents(processed.get(name))
+        for name in ('open_balance', 'ending_balance')
+    }
+    fields['currency'] = (original.get('currency') or '').upper() == (processed.get('currency') or '').upper()
+
+    amounts_a = Counter(_cents(t.get('amount')) for t in original.get('transactions') or [] if isinstance(t, dict))
+    amounts_b = Counter(_cents(t.get('amount')) for t in processed.get('transactions') or [] if isinstance(t, dict))
+    matched = sum((amounts_a & amounts_b).values())
+    total = max(sum(amounts_a.values()), sum(amounts_b.values()))
+    return {
+        'fields': fields,
+        'transactions': {'original': sum(amounts_a.values()), 'processed': sum(amounts_b.values()),
+                         'matched_amounts': matched},
+        'amount_agreement': round(matched / total, 4) if total else 1.0,
+        'identical': all(fields.values()) and amounts_a == amounts_b,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare ADE extractions of original and pre-processed images.")
+    parser.add_argument('samples', help="Directory of sample JPG/PNG statement images")
+    parser.add_argument('--max-long-side', type=int, default=DEFAULT_CONFIG['max_long_side'])
+    parser.add_argument('--grayscale', action='store_true', default=DEFAULT_CONFIG['grayscale'])
+    parser.add_argument('--jpeg-quality', type=int, default=DEFAULT_CONFIG['jpeg_quality'])
+    parser.add_argument('--min-agreement', type=float, default=1.0,
+                        help="Lowest acceptable share of matching transaction amounts per image")
+    parser.add_argument('--output', help="Write machine-readable results to this file")
+    args = parser.parse_args(argv)
+
+    from openomi_engine import get_engine
+    engine = get_engine()
+    config = {'max_long_side': args.max_long_side, 'grayscale': args.grayscale, 'jpeg_quality': args.jpeg_quality}
+
+    samples = sorted(path for path in Path(args.samples).iterdir() if is_image(path.name))
+    if not samples:
+        parser.error(f"No JPG/PNG images in {args.samples}")
+
+    results, failures = [], 0
+    for path in samples:
+        data = path.read_bytes()
+        _, processed_data = preprocess_image(path.name, data, config)
+        original = engine.extract(data, name=path.name)
+        processed = engine.extract(processed_data, name=path.name)
+        if 'error' in original or 'error' in processed:
+            result = {'file': path.name, 'error': original.get('error') or processed.get('error')}
+            failures += 1
+        else:
+            result = {'file': path.name, 'original_kb': round(len(data) / 1024), 'processed_kb': round(len(processed_data) / 1024),
+                      **compare_extractions(original, processed)}
+            if result['amount_agreement'] < args.min_agreement or not all(result['fields'].values()):
+                failures += 1
+        results.append(result)
+        print(f"{path.name}: {json.dumps(result)}", file=sys.stderr)
+
+    print(f"{len(samples) - failures}/{len(samples)} images extracted the same after pre-processing "
+          f"(max_long_side={args.max_long_side}, grayscale={args.grayscale}, jpeg_quality={args.jpeg_quality})",
+          file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': config, 'results': results}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
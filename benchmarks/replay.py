@@ -0,0 +1,166 @@
+"""
+Replays recorded production invocations against lambda_handler, offline.
+
+Recordings are written by the Lambda when OPENOMI_RECORD_DIR is set (see src/openomi_recorder.py).
+Each one holds the redacted Bedrock Agent event, the ADE parse/extract responses and their timings.
+Replay feeds those responses back through stand-in clients, so lambda_handler runs deterministically
+without AWS or LandingAI, and checks that it still returns the recorded response.
+
+    aws s3 sync s3://my-bucket/recordings ./recordings
+    python benchmarks/replay.py ./recordings
+    python benchmarks/replay.py ./recordings --realtime --repeat 20 --concurrency 8 --output replay_results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / 'src'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'offline-replay')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'offline-replay')
+os.environ.setdefault('VISION_AGENT_API_KEY', 'offline-replay')
+
+import openomi_logic
+
+from run_benchmarks import summarize
+
+# Keys added by optional, stateful features; they are not part of the replayed contract
+VOLATILE_KEYS = ('anomaly_baseline',)
+
+
+class ReplayClients:
+    """
+    S3 and ADE stand-ins serving the calls of the recording bound to the current thread,
+    in recorded order. With `speed`, recorded latencies are slept (1.0 = real time).
+    """
+
+    def __init__(self, speed: float | None = None):
+        self.speed = speed
+        self._current = threading.local()
+
+    def bind(self, record: dict):
+        calls = {}
+        for call in record['calls']:
+            # Recordings made before the shared engine downloaded with download_file
+            op = 'get_object' if call['op'] == 'download_file' else call['op']
+            calls.setdefault((call['service'], op), []).append(call)
+        self._current.calls = calls
+
+    def _next(self, service: str, op: str) -> dict:
+        queue = self._current.calls.get((service, op))
+        if not queue:
+            raise RuntimeError(f"Recording has no more {service}.{op} calls to replay")
+        call = queue.pop(0)
+        if self.speed:
+            time.sleep(call['seconds'] * self.speed)
+        return call
+
+    # --- S3 ---
+    def get_object(self, Bucket, Key, **kwargs):
+        call = self._next('s3', 'get_object')
+        return {'Body': io.BytesIO(b'\0' * call.get('bytes', 0))}
+
+    # --- ADE ---
+    def parse(self, **kwargs):
+        return SimpleNamespace(**self._next('ade', 'parse')['response'])
+
+    def extract(self, **kwargs):
+        return SimpleNamespace(**self._next('ade', 'extract')['response'])
+
+
+def load_recordings(path: str) -> list[dict]:
+    path = Path(path)
+    files = sorted(path.glob('*.json')) if path.is_dir() else [path]
+    recordings = []
+    for file in files:
+        with open(file) as f:
+            record = json.load(f)
+        record['_file'] = file.name
+        recordings.append(record)
+    return recordings
+
+
+def _comparable(body):
+    if isinstance(body, dict):
+        return {key: value for key, value in body.items() if key not in VOLATILE_KEYS}
+    return body
+
+
+def replay_one(clients: ReplayClients, record: dict) -> tuple[float, bool, str | None]:
+    clients.bind(record)
+    context = SimpleNamespace(aws_request_id=record['request_id'], function_name='replay')
+    start = time.perf_counter()
+    try:
+        response = openomi_logic.lambda_handler(record['event'], context)
+    except Exception as e:
+        return time.perf_counter() - start, False, f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+
+    body = json.loads(response['response']['responseBody']['application/json']['body'])
+    if _comparable(body) != _comparable(record['response_body']):
+        return elapsed, False, "response differs from the recording"
+    return elapsed, True, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded Lambda invocations offline.")
+    parser.add_argument('archive', help="Directory of recordings (or a single recording file)")
+    parser.add_argument('--realtime', action='store_true', help="Sleep the recorded S3/ADE latencies")
+    parser.add_argument('--speed', type=float, default=1.0, help="Latency multiplier with --realtime")
+    parser.add_argument('--repeat', type=int, default=1, help="Replay the archive this many times (load test)")
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--output', help="Write machine-readable results to this file")
+    parser.add_argument('--verbose', action='store_true', help="Keep the Lambda's log output")
+    args = parser.parse_args(argv)
+
+    recordings = load_recordings(args.archive)
+    if not recordings:
+        parser.error(f"No recordings found in {args.archive}")
+
+    clients = ReplayClients(args.speed if args.realtime else None)
+    openomi_logic.engine.s3_client = clients
+    openomi_logic.engine.ade_client = clients
+    # Replays must not write recordings, warehouse rows or baseline updates
+    openomi_logic.RECORD_DIR = None
+    openomi_logic.WAREHOUSE_DIR = None
+    openomi_logic.BASELINES_PATH = None
+
+    work = recordings * args.repeat
+    latencies, failures = [], []
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for record, (elapsed, ok, error) in zip(work, pool.map(lambda r: replay_one(clients, r), work)):
+                latencies.append(elapsed)
+                if not ok:
+                    failures.append({'file': record['_file'], 'error': error})
+    wall_seconds = time.perf_counter() - start
+
+    summary = summarize(latencies, len(failures), wall_seconds, 'invocation')
+    recorded = sorted(r['handler_seconds'] for r in recordings)
+    summary['recorded_p50_seconds'] = recorded[len(recorded) // 2]
+    results = {'archive': str(args.archive), 'recordings': len(recordings), 'replay': summary, 'failures': failures[:50]}
+
+    print(f"Replayed {len(work)} invocations from {len(recordings)} recordings: "
+          f"p50={summary['p50_seconds']:.4f}s p99={summary['p99_seconds']:.4f}s "
+          f"throughput={summary['throughput_per_second']}/s failures={len(failures)}", file=sys.stderr)
+    for failure in failures[:10]:
+        print(f"  {failure['file']}: {failure['error']}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
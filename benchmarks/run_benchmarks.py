@@ -0,0 +1,242 @@
+"""
+Offline performance benchmarks for the extraction Lambda and the app's audit pipeline.
+
+Runs against local stand-ins for S3, LandingAI ADE and the Bedrock Agent (see standins.py),
+so no AWS or LandingAI credentials are needed. Service latencies are real-world estimates
+scaled by --time-scale; use --time-scale 0 to measure pure code overhead.
+
+    python benchmarks/run_benchmarks.py --output bench_results.json
+    python benchmarks/run_benchmarks.py --scenarios single_file --iterations 200 --time-scale 0
+    python benchmarks/run_benchmarks.py --scenarios batch_extract --batch-size 2000 --extract-concurrency 200
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / 'src'))
+
+# openomi_logic builds its clients at import time; give them offline settings
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'offline-benchmark')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'offline-benchmark')
+os.environ.setdefault('VISION_AGENT_API_KEY', 'offline-benchmark')
+
+import openomi_logic
+from audit_jobs import AuditJob, run_audit
+
+from standins import FakeADE, FakeAsyncADE, FakeBedrockAgent, LatencyModel, LocalS3, make_agent_event, make_pdf_bytes
+
+SCENARIOS = ['single_file', 'application', 'batch', 'batch_extract']
+FILES_PER_APPLICATION = 6
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[rank], 6)
+
+
+def summarize(latencies: list[float], errors: int, wall_seconds: float, unit: str) -> dict:
+    ordered = sorted(latencies)
+    return {
+        'unit': unit,
+        'count': len(ordered),
+        'errors': errors,
+        'wall_seconds': round(wall_seconds, 4),
+        'throughput_per_second': round(len(ordered) / wall_seconds, 3) if wall_seconds else None,
+        'mean_seconds': round(sum(ordered) / len(ordered), 6) if ordered else None,
+        'p50_seconds': percentile(ordered, 50),
+        'p95_seconds': percentile(ordered, 95),
+        'p99_seconds': percentile(ordered, 99),
+        'max_seconds': round(ordered[-1], 6) if ordered else None,
+    }
+
+
+class Harness:
+    """Wires the stand-ins into the shared extraction engine and exposes the measured entry points."""
+
+    def __init__(self, args):
+        self.args = args
+        self.latency = LatencyModel(args.time_scale, seed=args.seed)
+        self.s3 = LocalS3(self.latency)
+        self.ade = FakeADE(self.latency)
+        self.agent = FakeBedrockAgent(self.latency, lambda_handler=openomi_logic.lambda_handler)
+        self.bucket = openomi_logic.BUCKET_NAME
+        self.document = make_pdf_bytes(args.pages)
+
+        openomi_logic.engine.s3_client = self.s3
+        openomi_logic.engine.ade_client = self.ade
+        openomi_logic.engine.async_ade_client = FakeAsyncADE(self.ade)
+
+    def seed_document(self) -> str:
+        file_key = f"audit-bench-{uuid.uuid4().hex[:8]}-statement.pdf"
+        self.s3.put(self.bucket, file_key, self.document)
+        return file_key
+
+    def lambda_invocation(self, file_key: str):
+        event = make_agent_event(file_key, 'FSW-EE')
+        response = openomi_logic.lambda_handler(event, SimpleNamespace(aws_request_id=str(uuid.uuid4())))
+        body = json.loads(response['response']['responseBody']['application/json']['body'])
+        if 'error' in body:
+            raise RuntimeError(body['error'])
+
+    def upload_file(self, file_name: str, file_bytes: bytes) -> str:
+        file_key = f"audit-bench-{uuid.uuid4().hex[:8]}-{file_name}"
+        self.s3.put_object(Bucket=self.bucket, Key=file_key, Body=file_bytes)
+        return file_key
+
+    def invoke_agent(self, prompt: str, on_chunk=None) -> tuple:
+        # Same stream consumption as app.invoke_bedrock_agent
+        start_time = time.time()
+        response = self.agent.invoke_agent(agentId='BENCH', agentAliasId='BENCH',
+                                           sessionId=str(uuid.uuid4()), inputText=prompt)
+        completion = ""
+        for event in response.get('completion', []):
+            chunk = event.get('chunk', {})
+            if 'bytes' in chunk:
+                completion += chunk['bytes'].decode('utf-8')
+                if on_chunk:
+                    on_chunk(len(completion))
+        return (completion, time.time() - start_time)
+
+    def application(self):
+        files = [(f"statement-{i + 1}.pdf", self.document) for i in range(FILES_PER_APPLICATION)]
+        job = AuditJob('benchmark', ['preprocess', 'upload', 'analysis', 'report'])
+        report = run_audit(job, files, 'FSW-EE', 'Federal Skilled Worker (Express Entry)', 1, {},
+                           upload_file=self.upload_file, invoke_agent=self.invoke_agent)
+        if report['verdict'] != 'APPROVED':
+            raise RuntimeError(f"Unexpected verdict: {report['verdict']}")
+
+
+def timed(fn, *args) -> tuple[float, bool]:
+    start = time.perf_counter()
+    try:
+        fn(*args)
+        return time.perf_counter() - start, True
+    except Exception as e:
+        print(f"  error: {e}", file=sys.stderr)
+        return time.perf_counter() - start, False
+
+
+def run_single_file(harness: Harness, args) -> dict:
+    """Latency of one lambda_handler invocation (download, parse, extract, response)."""
+    keys = [harness.seed_document() for _ in range(args.iterations)]
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for key in keys:
+        elapsed, ok = timed(harness.lambda_invocation, key)
+        latencies.append(elapsed)
+        errors += not ok
+    return summarize(latencies, errors, time.perf_counter() - start, 'invocation')
+
+
+def run_application(harness: Harness, args) -> dict:
+    """End-to-end app pipeline for one 6-file application, one application at a time."""
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(args.applications):
+        elapsed, ok = timed(harness.application)
+        latencies.append(elapsed)
+        errors += not ok
+    return summarize(latencies, errors, time.perf_counter() - start, 'application')
+
+
+def run_batch(harness: Harness, args) -> dict:
+    """Many applications pushed through the app pipeline concurrently."""
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for elapsed, ok in pool.map(lambda _: timed(harness.application), range(args.batch_size)):
+            latencies.append(elapsed)
+            errors += not ok
+    return summarize(latencies, errors, time.perf_counter() - start, 'application')
+
+
+def run_batch_extract(harness: Harness, args) -> dict:
+    """Bulk extraction through the shared engine's asyncio API (the batch CLI path)."""
+    engine = openomi_logic.engine
+    keys = [harness.seed_document() for _ in range(args.batch_size)]
+
+    async def run() -> list[tuple[float, bool]]:
+        semaphore = asyncio.Semaphore(args.extract_concurrency)
+
+        async def one(key):
+            async with semaphore:
+                # Timed from when the document gets a slot, like one extract_async call in production
+                start = time.perf_counter()
+                result = await engine.extract_async(key)
+                return time.perf_counter() - start, 'error' not in result
+
+        try:
+            return await asyncio.gather(*(one(key) for key in keys))
+        finally:
+            await engine.aclose()
+
+    start = time.perf_counter()
+    timings = asyncio.run(run())
+    wall_seconds = time.perf_counter() - start
+    return summarize([elapsed for elapsed, _ in timings], sum(not ok for _, ok in timings), wall_seconds, 'document')
+
+
+RUNNERS = {'single_file': run_single_file, 'application': run_application, 'batch': run_batch,
+           'batch_extract': run_batch_extract}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Openomi performance benchmarks.")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--output', default='bench_results.json', help="Machine-readable results file")
+    parser.add_argument('--time-scale', type=float, default=0.01,
+                        help="Multiplier applied to simulated service latencies (0 = no sleeping)")
+    parser.add_argument('--pages', type=int, default=4, help="Pages per simulated statement")
+    parser.add_argument('--iterations', type=int, default=100, help="Invocations for single_file")
+    parser.add_argument('--applications', type=int, default=20, help="Applications for the application scenario")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Applications for batch (documents for batch_extract)")
+    parser.add_argument('--concurrency', type=int, default=32, help="Concurrent applications in the batch scenario")
+    parser.add_argument('--extract-concurrency', type=int, default=100,
+                        help="Documents in flight in the batch_extract scenario")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--verbose', action='store_true', help="Keep the Lambda's log output")
+    args = parser.parse_args(argv)
+
+    harness = Harness(args)
+    results = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'verbose')},
+        'scenarios': {},
+    }
+
+    for name in args.scenarios:
+        print(f"Running {name}...", file=sys.stderr)
+        # The Lambda logs every event and response; keep that cost but not the noise
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            results['scenarios'][name] = RUNNERS[name](harness, args)
+        summary = results['scenarios'][name]
+        print(f"  {summary['count']} {summary['unit']}s, p50={summary['p50_seconds']:.4f}s "
+              f"p95={summary['p95_seconds']:.4f}s p99={summary['p99_seconds']:.4f}s "
+              f"throughput={summary['throughput_per_second']}/s errors={summary['errors']}", file=sys.stderr)
+
+    results['ade_calls'] = dict(harness.ade.calls)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
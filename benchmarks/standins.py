@@ -0,0 +1,294 @@
+"""
+Local stand-ins for S3, the LandingAI ADE client and the Bedrock Agent runtime.
+They mimic the call signatures used by openomi_logic.py and app.py, sleep for a
+configurable (scaled) latency instead of calling the network, and return canned payloads.
+"""
+import asyncio
+import copy
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+
+class LatencyModel:
+    """Latencies are given in real-world seconds and multiplied by time_scale before sleeping."""
+
+    def __init__(self, time_scale: float = 0.01, jitter: float = 0.2, seed: int = 7):
+        self.time_scale = time_scale
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def scaled(self, seconds: float) -> float:
+        if self.time_scale <= 0 or seconds <= 0:
+            return 0.0
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        return seconds * factor * self.time_scale
+
+    def sleep(self, seconds: float):
+        delay = self.scaled(seconds)
+        if delay:
+            time.sleep(delay)
+
+    async def sleep_async(self, seconds: float):
+        delay = self.scaled(seconds)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def make_pdf_bytes(pages: int, padding_kb: int = 40) -> bytes:
+    """Minimal PDF-looking payload with `pages` page objects, padded to a realistic size."""
+    body = b''.join(b'%d 0 obj << /Type /Page >> endobj\n' % (i + 3) for i in range(pages))
+    return b'%PDF-1.4\n' + body + b'%' + b'x' * (padding_kb * 1024 * pages) + b'\n%%EOF\n'
+
+
+def count_pages(data: bytes) -> int:
+    return max(1, len(re.findall(rb'/Type\s*/Page(?!s)', data)))
+
+
+def make_statement(transactions: int = 60, seed: int = 0) -> dict:
+    """Canned extraction shaped like BankStatementSchema."""
+    rnd = random.Random(seed)
+    txns = []
+    for i in range(transactions):
+        deposit = rnd.random() < 0.3
+        amount = round(rnd.lognormvariate(7 if deposit else 4, 1.0), 2)
+        txns.append({
+            'date': f"2024-{1 + i * 6 // transactions:02d}-{1 + i % 28:02d}",
+            'description': rnd.choice(['PAYROLL ACME CORP', 'E-TRANSFER FROM J SMITH', 'GROCERY STORE #12',
+                                       'RENT PAYMENT', 'ATM WITHDRAWAL', 'HYDRO BILL']),
+            'amount': amount if deposit else -amount,
+        })
+    return {
+        'account_holder': 'JANE APPLICANT',
+        'open_balance': 12000.0,
+        'ending_balance': round(12000.0 + sum(t['amount'] for t in txns), 2),
+        'currency': 'CAD',
+        'transactions': txns,
+    }
+
+
+def make_markdown(extraction: dict, pages: int) -> str:
+    rows = '\n'.join(f"| {t['date']} | {t['description']} | {t['amount']:.2f} |" for t in extraction['transactions'])
+    page = f"# Bank Statement\n\nAccount holder: {extraction['account_holder']}\n\n| Date | Description | Amount |\n|---|---|---|\n{rows}\n"
+    return '\n\n<!-- page break -->\n\n'.join([page] * pages)
+
+
+class NoSuchKey(FileNotFoundError):
+    pass
+
+
+def _precondition_failed(operation: str):
+    from botocore.exceptions import ClientError
+    return ClientError({'Error': {'Code': 'PreconditionFailed', 'Message': 'At least one of the pre-conditions '
+                                  'you specified did not hold'}}, operation)
+
+
+class LocalS3:
+    """In-memory S3 client supporting the calls the app and Lambda make."""
+
+    exceptions = SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self, latency: LatencyModel, request_latency: float = 0.03, seconds_per_mb: float = 0.02):
+        self.latency = latency
+        self.request_latency = request_latency
+        self.seconds_per_mb = seconds_per_mb
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self._lock = threading.Lock()
+
+    def _transfer(self, size: int):
+        self.latency.sleep(self.request_latency + self.seconds_per_mb * size / (1024 * 1024))
+
+    def put(self, bucket: str, key: str, data: bytes):
+        with self._lock:
+            self.objects[(bucket, key)] = data
+
+    def _get(self, bucket: str, key: str) -> bytes:
+        with self._lock:
+            if (bucket, key) not in self.objects:
+                raise NoSuchKey(f"NoSuchKey: s3://{bucket}/{key}")
+            return self.objects[(bucket, key)]
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        data = self._get(Bucket, Key)
+        self._transfer(len(data))
+        with open(Filename, 'wb') as f:
+            f.write(data)
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        data = self._get(Bucket, Key)
+        self._transfer(len(data))
+        Fileobj.write(data)
+
+    def get_object(self, Bucket, Key, **kwargs):
+        data = self._get(Bucket, Key)
+        self._transfer(len(data))
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data), 'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+        data = Fileobj.read()
+        self._transfer(len(data))
+        self.put(Bucket, Key, data)
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        with open(Filename, 'rb') as f:
+            self.upload_fileobj(f, Bucket, Key)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body if isinstance(Body, bytes) else Body.encode('utf-8') if isinstance(Body, str) else Body.read()
+        self._transfer(len(data))
+        with self._lock:
+            current = self.objects.get((Bucket, Key))
+            if 'IfNoneMatch' in kwargs and current is not None:
+                raise _precondition_failed('PutObject')
+            if 'IfMatch' in kwargs and (current is None or
+                                        kwargs['IfMatch'] != f'"{hashlib.md5(current).hexdigest()}"'):
+                raise _precondition_failed('PutObject')
+            self.objects[(Bucket, Key)] = data
+        return {'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+
+class FakeADE:
+    """
+    LandingAI ADE stand-in. parse() costs a fixed latency plus a cost per page of the
+    document; extract() costs a fixed latency. Both return canned payloads.
+    """
+
+    def __init__(self, latency: LatencyModel, parse_latency: float = 2.0, seconds_per_page: float = 1.5,
+                 extract_latency: float = 3.0, extraction: dict | None = None):
+        self.latency = latency
+        self.parse_latency = parse_latency
+        self.seconds_per_page = seconds_per_page
+        self.extract_latency = extract_latency
+        self.extraction = extraction or make_statement()
+        self.calls = {'parse': 0, 'extract': 0}
+        self._lock = threading.Lock()
+
+    def _read(self, document=None, document_url=None) -> bytes:
+        if document is not None:
+            if isinstance(document, tuple):
+                # (file name, bytes) as sent by the extraction engine
+                document = document[1]
+            if isinstance(document, (bytes, bytearray)):
+                return bytes(document)
+            if hasattr(document, 'read'):
+                return document.read()
+            with open(document, 'rb') as f:
+                return f.read()
+        with open(document_url, 'rb') as f:
+            return f.read()
+
+    def parse(self, document=None, document_url=None, model=None, **kwargs):
+        pages = count_pages(self._read(document, document_url))
+        with self._lock:
+            self.calls['parse'] += 1
+        self.latency.sleep(self.parse_latency + self.seconds_per_page * pages)
+        return SimpleNamespace(markdown=make_markdown(self.extraction, pages), metadata={'page_count': pages})
+
+    def extract(self, schema=None, markdown=None, model=None, **kwargs):
+        with self._lock:
+            self.calls['extract'] += 1
+        self.latency.sleep(self.extract_latency)
+        return SimpleNamespace(extraction=copy.deepcopy(self.extraction))
+
+
+class FakeAsyncADE:
+    """AsyncLandingAIADE stand-in sharing a FakeADE's payloads, latencies and call counts."""
+
+    def __init__(self, ade: FakeADE):
+        self.ade = ade
+
+    async def parse(self, document=None, document_url=None, model=None, **kwargs):
+        pages = count_pages(self.ade._read(document, document_url))
+        with self.ade._lock:
+            self.ade.calls['parse'] += 1
+        await self.ade.latency.sleep_async(self.ade.parse_latency + self.ade.seconds_per_page * pages)
+        return SimpleNamespace(markdown=make_markdown(self.ade.extraction, pages), metadata={'page_count': pages})
+
+    async def extract(self, schema=None, markdown=None, model=None, **kwargs):
+        with self.ade._lock:
+            self.ade.calls['extract'] += 1
+        await self.ade.latency.sleep_async(self.ade.extract_latency)
+        return SimpleNamespace(extraction=copy.deepcopy(self.ade.extraction))
+
+
+BEDROCK_REPORT = """## OPENOMI FINANCIAL AUDIT REPORT
+
+**Program:** {program}
+**Documents analyzed:** {documents}
+
+### Compliance
+Total funds meet the program threshold.
+
+### Fraud Indicators
+No suspicious deposit patterns in the transaction history.
+
+### VERDICT: APPROVED
+"""
+
+
+class FakeBedrockAgent:
+    """
+    bedrock-agent-runtime stand-in. invoke_agent() plays the agent's tool use: it calls the
+    extraction Lambda handler once per document key found in the prompt (like the real agent's
+    action group), waits for the model's reasoning latency, then streams a canned report.
+    """
+
+    KEY_PATTERN = re.compile(r'audit-[\w.\-]+')
+
+    def __init__(self, latency: LatencyModel, lambda_handler=None, reasoning_latency: float = 8.0,
+                 chunk_size: int = 64):
+        self.latency = latency
+        self.lambda_handler = lambda_handler
+        self.reasoning_latency = reasoning_latency
+        self.chunk_size = chunk_size
+
+    def invoke_agent(self, agentId=None, agentAliasId=None, sessionId=None, inputText='', **kwargs):
+        file_keys = list(dict.fromkeys(self.KEY_PATTERN.findall(inputText)))
+        program = re.search(r'\*\*Program Code:\*\*\s*(\S+)', inputText)
+        program = program.group(1) if program else 'FSW-EE'
+
+        if self.lambda_handler:
+            for file_key in file_keys:
+                event = make_agent_event(file_key, program, session_id=sessionId)
+                response = self.lambda_handler(event, SimpleNamespace(aws_request_id=str(uuid.uuid4())))
+                body = json.loads(response['response']['responseBody']['application/json']['body'])
+                if 'error' in body:
+                    raise RuntimeError(f"Extraction failed for {file_key}: {body['error']}")
+
+        self.latency.sleep(self.reasoning_latency)
+        report = BEDROCK_REPORT.format(program=program, documents=len(file_keys))
+
+        def completion():
+            for i in range(0, len(report), self.chunk_size):
+                yield {'chunk': {'bytes': report[i:i + self.chunk_size].encode('utf-8')}}
+
+        return {'completion': completion(), 'sessionId': sessionId}
+
+
+def make_agent_event(file_key: str, program_code: str | None = None, session_id: str | None = None) -> dict:
+    """Bedrock Agent action-group event in the requestBody/properties form."""
+    properties = [{'name': 'file_key', 'type': 'string', 'value': file_key}]
+    if program_code:
+        properties.append({'name': 'program_code', 'type': 'string', 'value': program_code})
+    return {
+        'messageVersion': '1.0',
+        'agent': {'name': 'openomi-agent', 'id': 'BENCHAGENT', 'alias': 'BENCHALIAS', 'version': '1'},
+        'sessionId': session_id or str(uuid.uuid4()),
+        'actionGroup': 'extraction-tools',
+        'apiPath': '/extract_document',
+        'httpMethod': 'POST',
+        'parameters': [],
+        'requestBody': {'content': {'application/json': {'properties': properties}}},
+        'sessionAttributes': {},
+        'promptSessionAttributes': {},
+        'inputText': 'Perform a complete IRCC financial compliance audit',
+    }
+
@@ -5,6 +5,14 @@ Remove-Item -Recurse -Force .aws-sam -ErrorAction SilentlyContinue
 Write-Host "`nBuilding SAM application..." -ForegroundColor Cyan
 sam build --use-container
 
+# pyarrow (transaction warehouse) is most of the layer; drop the parts the Lambda never loads
+Write-Host "`nPruning unused pyarrow components..." -ForegroundColor Yellow
+$pyarrowDir = ".aws-sam/build/OpenomiDependenciesLayer/python/pyarrow"
+if (Test-Path $pyarrowDir) {
+    Remove-Item -Recurse -Force "$pyarrowDir/tests", "$pyarrowDir/include" -ErrorAction SilentlyContinue
+    Get-ChildItem $pyarrowDir -File | Where-Object { $_.Name -match 'flight|substrait|gandiva|\.pyx$|\.pxd$' } | Remove-Item -Force
+}
+
 Write-Host "`nChecking build size..." -ForegroundColor Cyan
 $layerSize = (Get-ChildItem -Recurse .aws-sam/build/OpenomiDependenciesLayer | Measure-Object -Property Length -Sum).Sum / 1MB
 $functionSize = (Get-ChildItem -Recurse .aws-sam/build/OpenomiExtractionToolFunction | Measure-Object -Property Length -Sum).Sum / 1MB
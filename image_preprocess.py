@@ -0,0 +1,142 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    print("Failed to import Pillow. Uploaded images will not be pre-processed.")
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png'}
+
+# Statements are letter/A4 pages; only used to size the pages of a combined PDF
+ASSUMED_PAGE_LONG_SIDE_INCHES = 11.0
+
+# How large a photo or scan is kept, in pixels along its long side. The page may fill only part
+# of a phone photo, so this is deliberately generous: a page filling half of a 3300 px frame still
+# has ~150 DPI. Smaller images are never down-sampled.
+DEFAULT_MAX_LONG_SIDE = 3300
+
+DEFAULT_CONFIG = {
+    'enabled': os.getenv('OPENOMI_PREPROCESS_IMAGES', 'true').lower() == 'true',
+    'max_long_side': int(os.getenv('OPENOMI_PREPROCESS_MAX_LONG_SIDE', str(DEFAULT_MAX_LONG_SIDE))),
+    'grayscale': os.getenv('OPENOMI_PREPROCESS_GRAYSCALE', 'false').lower() == 'true',
+    'jpeg_quality': int(os.getenv('OPENOMI_PREPROCESS_JPEG_QUALITY', '92')),
+    'combine_pdf': os.getenv('OPENOMI_PREPROCESS_COMBINE_PDF', 'false').lower() == 'true',
+    'max_workers': int(os.getenv('OPENOMI_PREPROCESS_WORKERS', '4')),
+}
+
+
+def is_image(file_name: str) -> bool:
+    return Path(file_name).suffix.lower() in IMAGE_SUFFIXES
+
+
+def _scale_factor(img, max_long_side: int) -> float:
+    # The DPI tag of a phone photo (72) and the page's share of the frame are unknown, so
+    # only pixel count is bounded
+    return min(1.0, max_long_side / max(img.size))
+
+
+def _flatten(img):
+    # Transparent pixels usually hold black, so a plain convert('RGB') of a transparent PNG with
+    # black text gives a solid black page. Composite onto white paper instead.
+    if img.mode == 'P' and 'transparency' in img.info:
+        img = img.convert('RGBA')
+    if img.mode in ('RGBA', 'LA', 'PA'):
+        img = img.convert('RGBA')
+        page = Image.new('RGB', img.size, 'white')
+        page.paste(img, mask=img.getchannel('A'))
+        return page
+    return img if img.mode in ('RGB', 'L') else img.convert('RGB')
+
+
+def _prepare(data: bytes, config: dict):
+    img = Image.open(io.BytesIO(data))
+    had_exif = bool(img.getexif())
+    img = ImageOps.exif_transpose(img)  # bake in the phone's rotation before the EXIF is dropped
+    scale = _scale_factor(img, config['max_long_side'])
+    if scale < 1.0:
+        new_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(new_size, Image.Resampling.LANCZOS)
+    had_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+    img = _flatten(img)
+    if config['grayscale']:
+        img = img.convert('L')
+    return img, had_exif or had_alpha
+
+
+def preprocess_image(file_name: str, data: bytes, config: dict | None = None) -> tuple[str, bytes]:
+    """
+    Down-samples a scanned/photographed page whose long side exceeds `max_long_side` pixels,
+    flattens transparency onto white, optionally converts it to grayscale and re-encodes it
+    without EXIF. JPEGs stay JPEG and PNGs stay (lossless) PNG. Returns the original bytes if
+    the result is not smaller and there was no EXIF or transparency to remove.
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    img, must_rewrite = _prepare(data, config)
+
+    out = io.BytesIO()
+    if Path(file_name).suffix.lower() == '.png':
+        img.save(out, format='PNG', optimize=True)
+    else:
+        img.save(out, format='JPEG', quality=config['jpeg_quality'], optimize=True)
+    result = out.getvalue()
+
+    if len(result) >= len(data) and not must_rewrite:
+        return file_name, data
+    print(f"Pre-processed {file_name}: {len(data) / 1024:.0f} KB -> {len(result) / 1024:.0f} KB")
+    return file_name, result
+
+
+def images_to_pdf(pages: list[tuple[str, bytes]]) -> bytes:
+    """Combines already pre-processed page images into a single PDF, in the given order."""
+    images = [Image.open(io.BytesIO(data)) for _, data in pages]
+    images = [_flatten(img) for img in images]
+    out = io.BytesIO()
+    # Size the PDF pages like a letter/A4 page; the pixels themselves are kept as they are
+    resolution = max(images[0].size) / ASSUMED_PAGE_LONG_SIDE_INCHES
+    images[0].save(out, format='PDF', save_all=True, append_images=images[1:], resolution=resolution)
+    return out.getvalue()
+
+
+def preprocess_files(files: list[tuple[str, bytes]], config: dict | None = None, on_progress=None) -> list[tuple[str, bytes]]:
+    """
+    Pre-processes the image files of an upload in a worker pool (Pillow releases the GIL while
+    resampling and encoding). PDFs pass through untouched. With `combine_pdf`, all page images
+    are merged into one PDF placed where the first image was.
+    on_progress(done, total) reports progress.
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    image_indexes = [idx for idx, (name, _) in enumerate(files) if is_image(name)]
+    if not config['enabled'] or not image_indexes or Image is None:
+        return files
+
+    def run(idx):
+        name, data = files[idx]
+        try:
+            return preprocess_image(name, data, config)
+        except Exception as e:
+            print(f"WARNING: Could not pre-process {name}, uploading it as-is: {e}")
+            return name, data
+
+    processed = list(files)
+    with ThreadPoolExecutor(max_workers=config['max_workers']) as pool:
+        for done, (idx, result) in enumerate(zip(image_indexes, pool.map(run, image_indexes)), 1):
+            processed[idx] = result
+            if on_progress:
+                on_progress(done, len(image_indexes))
+
+    if config['combine_pdf'] and len(image_indexes) > 1:
+        pages = [processed[idx] for idx in image_indexes]
+        try:
+            pdf_name = f"{Path(pages[0][0]).stem}-pages.pdf"
+            combined = (pdf_name, images_to_pdf(pages))
+            processed = [item for idx, item in enumerate(processed) if idx not in image_indexes[1:]]
+            processed[image_indexes[0]] = combined
+            print(f"Combined {len(pages)} page images into {pdf_name}")
+        except Exception as e:
+            print(f"WARNING: Could not combine page images into a PDF: {e}")
+
+    return processed
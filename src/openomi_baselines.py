@@ -0,0 +1,480 @@
+import argparse
+import json
+import math
+import os
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so only one writer per file
+    fcntl = None
+
+# Where the baseline state is persisted between invocations: s3://bucket/key.json (shared by all
+# Lambda containers) or a local/mounted file. Scoring is skipped when unset.
+BASELINES_PATH = os.environ.get('OPENOMI_BASELINES_PATH')
+
+# How often a conditional S3 write is retried when another container updated the object first
+S3_MERGE_ATTEMPTS = 8
+
+# Below this many deposits a program baseline is too thin, so the all-programs baseline is used
+MIN_BASELINE_DEPOSITS = int(os.environ.get('OPENOMI_MIN_BASELINE_DEPOSITS', '200'))
+
+ALL_PROGRAMS = '*'
+
+# Expected first-digit frequencies under Benford's law (index 0 = digit 1)
+BENFORD_EXPECTED = [math.log10(1 + 1 / d) for d in range(1, 10)]
+
+# Below this many first digits a Benford test says nothing about one statement
+MIN_BENFORD_DIGITS = 30
+
+# Share of ordinary statements allowed to have a flagged deposit. A statement with n deposits
+# gets n draws, so each deposit is held to 1 - rate / n (Bonferroni).
+STATEMENT_FLAG_RATE = 0.01
+
+# Nigrini's first-digit mean absolute deviation thresholds
+BENFORD_MAD_THRESHOLDS = [(0.006, 'close'), (0.012, 'acceptable'), (0.015, 'marginal')]
+
+# Deposit-size histogram edges (log10 decades): <$10, $10-100, ..., >=$1M
+SIZE_BUCKET_LABELS = ['<10', '10-100', '100-1k', '1k-10k', '10k-100k', '100k-1M', '>=1M']
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (DDSketch).
+    Values are counted in logarithmic buckets, so any quantile is within `relative_accuracy`
+    of the true value, memory is bounded by `max_buckets` and two sketches merge by adding counts.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value: float):
+        if value <= 0:
+            self.zero_count += 1
+        else:
+            idx = self._index(value)
+            self.buckets[idx] = self.buckets.get(idx, 0) + 1
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+        self.count += 1
+
+    def _collapse(self):
+        # Fold the lowest buckets together; only tiny values lose precision
+        keys = sorted(self.buckets)
+        excess = len(keys) - self.max_buckets
+        folded = sum(self.buckets.pop(k) for k in keys[:excess + 1])
+        self.buckets[keys[excess]] = self.buckets.get(keys[excess], 0) + folded
+
+    def merge(self, other: 'QuantileSketch'):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with a different relative accuracy.")
+        for idx, n in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + n
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> float | None:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if rank < seen:
+                return 2 * self.gamma ** idx / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def rank(self, value: float) -> float | None:
+        """Fraction of the recorded values that are <= value (the value's percentile)."""
+        if self.count == 0:
+            return None
+        if value <= 0:
+            return self.zero_count / self.count
+        limit = self._index(value)
+        below = self.zero_count + sum(n for idx, n in self.buckets.items() if idx <= limit)
+        return below / self.count
+
+    def to_dict(self) -> dict:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_buckets': self.max_buckets,
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'buckets': {str(k): v for k, v in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'], data['max_buckets'])
+        sketch.buckets = {int(k): v for k, v in data['buckets'].items()}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        return sketch
+
+
+def first_digit(value: float) -> int | None:
+    value = abs(value)
+    if value == 0 or not math.isfinite(value):
+        return None
+    # Read the digit from the decimal representation; float division misreads e.g. 0.3 as 2
+    return int(f"{value:e}"[0])
+
+
+def size_bucket(value: float) -> int:
+    if value < 10:
+        return 0
+    return min(int(math.log10(value)), len(SIZE_BUCKET_LABELS) - 1)
+
+
+def _deposits(extraction: dict) -> list[dict]:
+    deposits = []
+    for txn in extraction.get('transactions') or []:
+        if not isinstance(txn, dict):
+            continue
+        try:
+            amount = float(txn.get('amount'))
+        except (TypeError, ValueError):
+            continue
+        if amount > 0:
+            deposits.append({'date': txn.get('date'), 'description': txn.get('description'), 'amount': amount})
+    return deposits
+
+
+def _amounts(extraction: dict) -> list[float]:
+    amounts = []
+    for txn in extraction.get('transactions') or []:
+        try:
+            amounts.append(float(txn.get('amount')))
+        except (TypeError, ValueError, AttributeError):
+            continue
+    return amounts
+
+
+class Baseline:
+    """Streaming distribution of the statements seen for one program and currency."""
+
+    def __init__(self):
+        self.statements = 0
+        self.deposit_sizes = QuantileSketch()
+        self.statement_deposit_totals = QuantileSketch()
+        self.statement_largest_deposits = QuantileSketch()
+        self.benford_counts = [0] * 9
+        self.size_histogram = [0] * len(SIZE_BUCKET_LABELS)
+
+    def update(self, extraction: dict):
+        deposits = _deposits(extraction)
+        for dep in deposits:
+            self.deposit_sizes.add(dep['amount'])
+            self.size_histogram[size_bucket(dep['amount'])] += 1
+        self.statement_deposit_totals.add(sum(dep['amount'] for dep in deposits))
+        if deposits:
+            self.statement_largest_deposits.add(max(dep['amount'] for dep in deposits))
+        for amount in _amounts(extraction):
+            digit = first_digit(amount)
+            if digit:
+                self.benford_counts[digit - 1] += 1
+        self.statements += 1
+
+    def merge(self, other: 'Baseline'):
+        self.statements += other.statements
+        self.deposit_sizes.merge(other.deposit_sizes)
+        self.statement_deposit_totals.merge(other.statement_deposit_totals)
+        self.statement_largest_deposits.merge(other.statement_largest_deposits)
+        self.benford_counts = [a + b for a, b in zip(self.benford_counts, other.benford_counts)]
+        self.size_histogram = [a + b for a, b in zip(self.size_histogram, other.size_histogram)]
+
+    def benford_distribution(self) -> list[float]:
+        """Observed population first-digit distribution, falling back to Benford's law when empty."""
+        total = sum(self.benford_counts)
+        if total < MIN_BASELINE_DEPOSITS:
+            return BENFORD_EXPECTED
+        return [n / total for n in self.benford_counts]
+
+    def to_dict(self) -> dict:
+        return {
+            'statements': self.statements,
+            'deposit_sizes': self.deposit_sizes.to_dict(),
+            'statement_deposit_totals': self.statement_deposit_totals.to_dict(),
+            'statement_largest_deposits': self.statement_largest_deposits.to_dict(),
+            'benford_counts': self.benford_counts,
+            'size_histogram': self.size_histogram,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Baseline':
+        baseline = cls()
+        baseline.statements = data['statements']
+        baseline.deposit_sizes = QuantileSketch.from_dict(data['deposit_sizes'])
+        baseline.statement_deposit_totals = QuantileSketch.from_dict(data['statement_deposit_totals'])
+        if 'statement_largest_deposits' in data:  # absent from files written before it was tracked
+            baseline.statement_largest_deposits = QuantileSketch.from_dict(data['statement_largest_deposits'])
+        baseline.benford_counts = list(data['benford_counts'])
+        baseline.size_histogram = list(data['size_histogram'])
+        return baseline
+
+
+def _benford_mad(amounts: list[float], expected: list[float]) -> tuple[float | None, int]:
+    counts = [0] * 9
+    for amount in amounts:
+        digit = first_digit(amount)
+        if digit:
+            counts[digit - 1] += 1
+    total = sum(counts)
+    if total == 0:
+        return None, 0
+    return sum(abs(counts[i] / total - expected[i]) for i in range(9)) / 9, total
+
+
+def _benford_conformity(mad: float) -> str:
+    for threshold, label in BENFORD_MAD_THRESHOLDS:
+        if mad <= threshold:
+            return label
+    return 'nonconformity'
+
+
+class BaselineStore:
+    """
+    Population baselines keyed by (program, currency).
+    Every statement also updates the all-programs baseline of its currency, which is used
+    while a program has not yet seen MIN_BASELINE_DEPOSITS deposits.
+    """
+
+    def __init__(self):
+        self.baselines: dict[str, Baseline] = {}
+
+    @staticmethod
+    def key(program: str | None, currency: str | None) -> str:
+        return f"{(program or ALL_PROGRAMS).upper()}|{(currency or 'UNKNOWN').upper()}"
+
+    def update(self, extraction: dict, program: str | None = None):
+        currency = extraction.get('currency')
+        keys = {self.key(ALL_PROGRAMS, currency), self.key(program, currency)}
+        for key in keys:
+            self.baselines.setdefault(key, Baseline()).update(extraction)
+
+    def merge(self, other: 'BaselineStore'):
+        for key, baseline in other.baselines.items():
+            if key in self.baselines:
+                self.baselines[key].merge(baseline)
+            else:
+                self.baselines[key] = Baseline.from_dict(baseline.to_dict())
+
+    def _reference(self, program: str | None, currency: str | None) -> tuple[str, Baseline | None]:
+        key = self.key(program, currency)
+        baseline = self.baselines.get(key)
+        if baseline is None or baseline.deposit_sizes.count < MIN_BASELINE_DEPOSITS:
+            key = self.key(ALL_PROGRAMS, currency)
+            baseline = self.baselines.get(key)
+        return key, baseline
+
+    def score(self, extraction: dict, program: str | None = None) -> dict:
+        """
+        Scores one statement against the population baseline.
+        The largest deposit and the deposit total are ranked against the same per-statement
+        figures of past statements, so an ordinary statement scores near the median.
+        Percentiles are looked up in the sketches, so the cost does not depend on how much
+        history has been processed.
+        """
+        key, baseline = self._reference(program, extraction.get('currency'))
+        deposits = _deposits(extraction)
+        expected = baseline.benford_distribution() if baseline else BENFORD_EXPECTED
+        mad, digits = _benford_mad(_amounts(extraction), expected)
+
+        result = {
+            'baseline': key,
+            'baseline_statements': baseline.statements if baseline else 0,
+            'baseline_deposits': baseline.deposit_sizes.count if baseline else 0,
+            'benford': {
+                'digits': digits,
+                'mad': round(mad, 4) if mad is not None else None,
+                'conformity': _benford_conformity(mad) if digits >= MIN_BENFORD_DIGITS else None,
+            },
+        }
+        if not baseline or baseline.deposit_sizes.count < MIN_BASELINE_DEPOSITS:
+            result['note'] = "Baseline too small for calibrated deposit percentiles."
+            result['anomaly_score'] = None
+            return result
+
+        threshold = 1 - STATEMENT_FLAG_RATE / max(1, len(deposits))
+        unusual = []
+        for dep in deposits:
+            percentile = baseline.deposit_sizes.rank(dep['amount'])
+            if percentile >= threshold:
+                unusual.append({**dep, 'percentile': round(percentile, 4)})
+
+        largest = max(deposits, key=lambda dep: dep['amount'], default=None)
+        if largest:
+            percentile = baseline.statement_largest_deposits.rank(largest['amount'])
+            largest = {**largest, 'percentile': round(percentile, 4) if percentile is not None else None}
+
+        total = sum(dep['amount'] for dep in deposits)
+        total_percentile = baseline.statement_deposit_totals.rank(total)
+        components = [
+            (largest['percentile'] if largest else None) or 0.0,
+            total_percentile or 0.0,
+            min(1.0, (mad or 0.0) / 0.03) if digits >= MIN_BENFORD_DIGITS else 0.0,
+        ]
+        result.update({
+            'largest_deposit': largest,
+            'unusual_deposits': unusual,
+            'deposit_flag_percentile': round(threshold, 6),
+            'deposit_total': {'amount': round(total, 2), 'percentile': round(total_percentile, 4)},
+            'population_p99_deposit': round(baseline.deposit_sizes.quantile(0.99), 2),
+            'anomaly_score': round(max(components), 4),
+        })
+        return result
+
+    def to_dict(self) -> dict:
+        return {key: baseline.to_dict() for key, baseline in self.baselines.items()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BaselineStore':
+        store = cls()
+        store.baselines = {key: Baseline.from_dict(value) for key, value in data.items()}
+        return store
+
+    def save(self, path: str):
+        if _is_s3(path):
+            bucket, key = _s3_location(path)
+            _s3_client().put_object(Bucket=bucket, Key=key, Body=json.dumps(self.to_dict()).encode())
+            return
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'BaselineStore':
+        if _is_s3(path):
+            return _load_s3(path)[0]
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+_s3 = None
+
+
+def _s3_client():
+    global _s3
+    if _s3 is None:
+        import boto3
+        _s3 = boto3.client('s3')
+    return _s3
+
+
+def _is_s3(path: str) -> bool:
+    return path.startswith('s3://')
+
+
+def _s3_location(path: str) -> tuple[str, str]:
+    bucket, _, key = path[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def _load_s3(path: str) -> tuple[BaselineStore, str | None]:
+    """(store, ETag) of an S3 baseline object; an empty store and no ETag if it does not exist yet."""
+    bucket, key = _s3_location(path)
+    client = _s3_client()
+    try:
+        response = client.get_object(Bucket=bucket, Key=key)
+    except client.exceptions.NoSuchKey:
+        return BaselineStore(), None
+    return BaselineStore.from_dict(json.loads(response['Body'].read())), response['ETag']
+
+
+def _merge_into_s3(path: str, delta: BaselineStore) -> BaselineStore:
+    # Optimistic concurrency: the write only succeeds if the object is still the one we read
+    # (If-Match), or still absent (If-None-Match), otherwise re-read and merge again
+    from botocore.exceptions import ClientError
+
+    bucket, key = _s3_location(path)
+    for _ in range(S3_MERGE_ATTEMPTS):
+        store, etag = _load_s3(path)
+        store.merge(delta)
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            _s3_client().put_object(Bucket=bucket, Key=key, Body=json.dumps(store.to_dict()).encode(), **condition)
+            return store
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise
+    raise RuntimeError(f"Could not update {path}: other writers kept changing it ({S3_MERGE_ATTEMPTS} attempts).")
+
+
+def merge_into(path: str, delta: BaselineStore) -> BaselineStore:
+    """
+    Adds `delta` to the baselines stored at `path` and returns the merged store.
+    A local file is re-read under an exclusive lock, an S3 object is written conditionally on
+    the ETag that was read, so concurrent writers (processes, or containers sharing an EFS
+    mount or bucket) each add their own updates instead of overwriting each other's from a
+    stale copy.
+    """
+    if _is_s3(path):
+        return _merge_into_s3(path, delta)
+    with open(f"{path}.lock", 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        store = BaselineStore.load(path)
+        store.merge(delta)
+        store.save(path)
+    return store
+
+
+def summarize(store: BaselineStore) -> dict:
+    summary = {}
+    for key, baseline in sorted(store.baselines.items()):
+        sketch = baseline.deposit_sizes
+        summary[key] = {
+            'statements': baseline.statements,
+            'deposits': sketch.count,
+            'deposit_p50': sketch.quantile(0.5),
+            'deposit_p95': sketch.quantile(0.95),
+            'deposit_p99': sketch.quantile(0.99),
+            'size_histogram': dict(zip(SIZE_BUCKET_LABELS, baseline.size_histogram)),
+            'benford': [round(p, 4) for p in baseline.benford_distribution()],
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage Openomi population anomaly baselines.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('merge', help="Merge the baseline files of several batch workers")
+    cmd.add_argument('output')
+    cmd.add_argument('inputs', nargs='+')
+
+    cmd = commands.add_parser('summary', help="Print the quantiles and distributions of a baseline file")
+    cmd.add_argument('path', nargs='?', default=BASELINES_PATH)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'merge':
+        merged = BaselineStore()
+        for path in args.inputs:
+            merged.merge(BaselineStore.load(path))
+        merged.save(args.output)
+        print(f"Merged {len(args.inputs)} baseline files into {args.output}")
+    else:
+        if not args.path:
+            parser.error("No baseline file. Pass a path or set OPENOMI_BASELINES_PATH.")
+        print(json.dumps(summarize(BaselineStore.load(args.path)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import boto3
+from botocore.config import Config
+
+try:
+    import httpx
+    from landingai_ade import AsyncLandingAIADE, DefaultAsyncHttpxClient, DefaultHttpxClient, LandingAIADE
+    from landingai_ade.lib import pydantic_to_json_schema
+    from pydantic import BaseModel, Field
+except ImportError:
+    print("Failed to import landingai-ade or pydantic. Ensure Layer is attached.")
+
+BUCKET_NAME = os.environ.get('S3_UPLOADS_BUCKET', 'openomi-uploads-dev')
+
+PARSE_MODEL = "dpt-2-latest"
+EXTRACT_MODEL = "extract-latest"
+
+# Size of the shared HTTP connection pools (S3 and LandingAI)
+MAX_CONNECTIONS = int(os.environ.get('OPENOMI_ENGINE_MAX_CONNECTIONS', '64'))
+MAX_RETRIES = int(os.environ.get('OPENOMI_ENGINE_MAX_RETRIES', '2'))
+
+# --- Pydantic Schema (Defines what LandingAI should extract) ---
+class Transaction(BaseModel):
+    date: str = Field(description="The date of the transaction")
+    description: str = Field(description="The description of the transaction")
+    amount: float = Field(description="The value of the transaction (use negative for withdrawals)")
+
+class BankStatementSchema(BaseModel):
+    account_holder: str = Field(description="Full name of the account holder")
+    open_balance: float = Field(description="The opening balance at the start of the period")
+    ending_balance: float = Field(description="The final balance at the end of the period")
+    currency: str = Field(description="The currency of the balances (e.g., CAD, USD)")
+    transactions: list[Transaction] = Field(description="A list of all transactions found in the statement")
+
+SCHEMA_JSON = pydantic_to_json_schema(BankStatementSchema)
+
+
+class ExtractionEngine:
+    """
+    The Parse -> Extract flow shared by the Lambda, the local test tools and batch jobs.
+
+    A source is an S3 key (str), raw bytes, or a local path (pathlib.Path / os.PathLike).
+    Documents are sent to LandingAI from memory, so no temp files are needed. Clients are
+    created once and reused: S3 and ADE share pooled HTTP connections across threads, and
+    the asyncio API keeps one async ADE client per event loop so hundreds of documents can be
+    in flight from one process.
+
+    Results follow the repo convention: the extraction dict, or {'error': ...}.
+    """
+
+    def __init__(self, bucket_name: str = BUCKET_NAME, s3_client=None, ade_client=None,
+                 async_ade_client=None, max_connections: int = MAX_CONNECTIONS):
+        self.bucket_name = bucket_name
+        self.max_connections = max_connections
+        self.s3_client = s3_client or boto3.client('s3', config=Config(max_pool_connections=max_connections))
+        self._ade_client = ade_client
+        self._async_ade_client = async_ade_client
+        self._owns_async_client = False
+        self._async_loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def ade_client(self):
+        if self._ade_client is None:
+            with self._lock:
+                if self._ade_client is None:
+                    limits = httpx.Limits(max_connections=self.max_connections,
+                                          max_keepalive_connections=self.max_connections)
+                    self._ade_client = LandingAIADE(http_client=DefaultHttpxClient(limits=limits),
+                                                    max_retries=MAX_RETRIES)
+        return self._ade_client
+
+    @ade_client.setter
+    def ade_client(self, client):
+        self._ade_client = client
+
+    @property
+    def async_ade_client(self):
+        """
+        Async ADE client bound to the running event loop (async HTTP pools cannot cross loops).
+        Call aclose() before the loop ends; a client left behind by a finished loop is dropped.
+        """
+        loop = asyncio.get_running_loop()
+        if self._owns_async_client and self._async_loop is not loop:
+            self._drop_async_client()
+        if self._async_ade_client is None:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._async_ade_client = AsyncLandingAIADE(http_client=DefaultAsyncHttpxClient(limits=limits),
+                                                       max_retries=MAX_RETRIES)
+            self._owns_async_client = True
+            self._async_loop = loop
+        return self._async_ade_client
+
+    @async_ade_client.setter
+    def async_ade_client(self, client):
+        self._async_ade_client = client
+        self._owns_async_client = False
+        self._async_loop = None
+
+    def _drop_async_client(self):
+        client, loop = self._async_ade_client, self._async_loop
+        self._async_ade_client, self._async_loop, self._owns_async_client = None, None, False
+        # Its pool can only be closed on its own loop; if that loop has already ended, its
+        # connections went with it
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.close(), loop)
+
+    async def aclose(self):
+        """Closes the async ADE client (and its connection pool) this engine created on the running loop."""
+        if self._owns_async_client and self._async_loop is asyncio.get_running_loop():
+            client = self._async_ade_client
+            self._async_ade_client, self._async_loop, self._owns_async_client = None, None, False
+            await client.close()
+
+    # --- Loading sources ---
+
+    def _load(self, source, name: str | None = None) -> tuple[str, bytes]:
+        """Returns (file name, document bytes) for an S3 key, bytes or a local path."""
+        if isinstance(source, (bytes, bytearray)):
+            return name or 'document.pdf', bytes(source)
+        if isinstance(source, os.PathLike):
+            return name or Path(source).name, Path(source).read_bytes()
+        print(f"Downloading s3://{self.bucket_name}/{source}")
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=source)
+        return name or Path(source).name, response['Body'].read()
+
+    @staticmethod
+    def _label(source, name: str | None) -> str:
+        if isinstance(source, (bytes, bytearray)):
+            return name or f"<{len(source)} bytes>"
+        return str(source)
+
+    # --- Sync API ---
+
+    def extract(self, source, name: str | None = None) -> dict:
+        """Parses a document to markdown, then extracts structured JSON with SCHEMA_JSON."""
+        label = self._label(source, name)
+        try:
+            start_time = time.perf_counter()
+            file_name, data = self._load(source, name)
+
+            print(f"Parsing document: {label}")
+            parse_response = self.ade_client.parse(document=(file_name, data), model=PARSE_MODEL)
+            if not parse_response.markdown:
+                return {"error": "Parse failed. No markdown returned."}
+
+            print(f"Parse successful. Extracting JSON for {label}...")
+            json_data = self.ade_client.extract(schema=SCHEMA_JSON, markdown=parse_response.markdown,
+                                                model=EXTRACT_MODEL)
+            if not json_data.extraction:
+                return {'error': 'Extract failed. No JSON data found.'}
+
+            print(f"Extraction successful for {label} ({time.perf_counter() - start_time:.1f}s).")
+            return json_data.extraction
+
+        except Exception as e:
+            print(f"ERROR extracting {label}: {e}")
+            return {'error': str(e)}
+
+    def extract_many(self, sources: list, max_workers: int = 16) -> list[dict]:
+        """Extracts several documents on a thread pool sharing this engine's clients. Keeps input order."""
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(self.extract, sources))
+
+    # --- Async API ---
+
+    async def extract_async(self, source, name: str | None = None) -> dict:
+        """asyncio version of extract(). The S3 download runs in a worker thread."""
+        label = self._label(source, name)
+        try:
+            start_time = time.perf_counter()
+            file_name, data = await asyncio.to_thread(self._load, source, name)
+            client = self.async_ade_client
+
+            parse_response = await client.parse(document=(file_name, data), model=PARSE_MODEL)
+            if not parse_response.markdown:
+                return {"error": "Parse failed. No markdown returned."}
+
+            json_data = await client.extract(schema=SCHEMA_JSON, markdown=parse_response.markdown,
+                                             model=EXTRACT_MODEL)
+            if not json_data.extraction:
+                return {'error': 'Extract failed. No JSON data found.'}
+
+            print(f"Extraction successful for {label} ({time.perf_counter() - start_time:.1f}s).")
+            return json_data.extraction
+
+        except Exception as e:
+            print(f"ERROR extracting {label}: {e}")
+            return {'error': str(e)}
+
+    async def extract_many_async(self, sources: list, concurrency: int = 100) -> list[dict]:
+        """Extracts many documents concurrently, at most `concurrency` in flight. Keeps input order."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(source):
+            async with semaphore:
+                return await self.extract_async(source)
+
+        return await asyncio.gather(*(run(source) for source in sources))
+
+
+_engines: dict[str, ExtractionEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(bucket_name: str | None = None) -> ExtractionEngine:
+    """Process-wide engine per bucket, so every caller shares the same pooled clients."""
+    bucket_name = bucket_name or BUCKET_NAME
+    with _engines_lock:
+        if bucket_name not in _engines:
+            _engines[bucket_name] = ExtractionEngine(bucket_name)
+        return _engines[bucket_name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-extract documents (S3 keys or local files) to JSON lines.")
+    parser.add_argument('sources', nargs='*', help="S3 keys, or local paths with --local")
+    parser.add_argument('--keys-file', help="File with one S3 key (or path) per line")
+    parser.add_argument('--local', action='store_true', help="Treat sources as local file paths")
+    parser.add_argument('--bucket', default=BUCKET_NAME)
+    parser.add_argument('--concurrency', type=int, default=100, help="Documents in flight at once")
+    parser.add_argument('--output', default='extractions.jsonl', help="JSON lines output file")
+    args = parser.parse_args(argv)
+
+    sources = list(args.sources)
+    if args.keys_file:
+        with open(args.keys_file) as f:
+            sources += [line.strip() for line in f if line.strip()]
+    if not sources:
+        parser.error("No documents given.")
+    if args.local:
+        sources = [Path(source) for source in sources]
+
+    engine = ExtractionEngine(args.bucket, max_connections=max(MAX_CONNECTIONS, args.concurrency))
+
+    async def run():
+        try:
+            return await engine.extract_many_async(sources, args.concurrency)
+        finally:
+            await engine.aclose()
+
+    start_time = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - start_time
+
+    with open(args.output, 'w') as out:
+        for source, result in zip(sources, results):
+            out.write(json.dumps({'source': str(source), 'result': result}) + '\n')
+    errors = sum(1 for result in results if 'error' in result)
+    print(f"Extracted {len(sources)} documents in {elapsed:.1f}s ({errors} errors) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
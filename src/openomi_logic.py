@@ -1,80 +1,105 @@
 import json
 import os
-import tempfile
-import boto3
-from pathlib import Path
+import threading
 
-try:
-    from landingai_ade import LandingAIADE
-    from landingai_ade.lib import pydantic_to_json_schema
-    from pydantic import BaseModel, Field
-except ImportError:
-    print("Failed to import landingai-ade or pydantic. Ensure Layer is attached.")
-
-# --- Initialize clients (outside handler for reuse) ---
-s3_client = boto3.client('s3')
-ade_client = LandingAIADE()
+import openomi_profiling
+import openomi_recorder
+from openomi_engine import BankStatementSchema, SCHEMA_JSON, Transaction, get_engine
 
 BUCKET_NAME = os.environ.get('S3_UPLOADS_BUCKET', 'openomi-uploads-dev')
+WAREHOUSE_DIR = os.environ.get('OPENOMI_WAREHOUSE_DIR')
+BASELINES_PATH = os.environ.get('OPENOMI_BASELINES_PATH')
+RECORD_DIR = openomi_recorder.RECORD_DIR
+
+# --- Shared extraction engine (outside handler so pooled clients are reused) ---
+engine = get_engine(BUCKET_NAME)
 
-# --- Pydantic Schema (Defines what LandingAI should extract) ---
-class Transaction(BaseModel):
-    date: str = Field(description="The date of the transaction")
-    description: str = Field(description="The description of the transaction")
-    amount: float = Field(description="The value of the transaction (use negative for withdrawals)")
+if RECORD_DIR:
+    # Capture ADE responses and S3 timings for offline replay (see openomi_recorder.py)
+    engine.s3_client = openomi_recorder.RecordingS3(engine.s3_client)
+    engine.ade_client = openomi_recorder.RecordingADE(engine.ade_client)
 
-class BankStatementSchema(BaseModel):
-    account_holder: str = Field(description="Full name of the account holder")
-    open_balance: float = Field(description="The opening balance at the start of the period")
-    ending_balance: float = Field(description="The final balance at the end of the period")
-    currency: str = Field(description="The currency of the balances (e.g., CAD, USD)")
-    transactions: list[Transaction] = Field(description="A list of all transactions found in the statement")
+if WAREHOUSE_DIR:
+    # Fail once, loudly, at cold start rather than warning on every invocation
+    try:
+        import openomi_warehouse
+    except ImportError as e:
+        print(f"ERROR: Transaction warehouse disabled: {e}")
+        WAREHOUSE_DIR = None
 
-SCHEMA_JSON = pydantic_to_json_schema(BankStatementSchema)
+# Latest population baselines seen by this container, refreshed on every update
+_baseline_store = None
+_baseline_lock = threading.Lock()
 
-def run_extraction_from_s3(file_key: str) -> dict:
+def store_in_warehouse(extraction: dict, file_key: str):
     """
-    Runs the Parse/Extract flow on a file stored in S3.
-    Downloads the file, parses it to markdown, then extracts structured JSON.
+    Appends the extracted transactions to the columnar warehouse (see openomi_warehouse.py).
+    A warehouse failure is logged but never fails the extraction itself.
     """
     try:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            local_file_path = os.path.join(tmp_dir, Path(file_key).name)
-            
-            print(f"Downloading s3://{BUCKET_NAME}/{file_key} to {local_file_path}")
-            s3_client.download_file(BUCKET_NAME, file_key, local_file_path)
-
-            print(f"Parsing document: {local_file_path}")
-            parse_response = ade_client.parse(
-                document_url=str(local_file_path),
-                model="dpt-2-latest"
-            )
-
-            if not parse_response.markdown:
-                return {"error": "Parse failed. No markdown returned."}
-
-            print("Parse successful. Extracting JSON...")
-            json_data = ade_client.extract(
-                schema=SCHEMA_JSON,
-                markdown=parse_response.markdown,
-                model="extract-latest"
-            )
-
-            if not json_data.extraction:
-                return {'error': 'Extract failed. No JSON data found.'}
-
-            print("Extraction successful.")
-            return json_data.extraction
-            
+        openomi_warehouse.append_extraction(extraction, file_key, root=WAREHOUSE_DIR)
     except Exception as e:
-        print(f"ERROR in run extraction from_s3: {e}")
-        return {'error': str(e)}
+        print(f"WARNING: Could not write {file_key} to the transaction warehouse: {e}")
+
+def score_against_baselines(extraction: dict, program_code: str | None = None) -> dict | None:
+    """
+    Scores the statement against the population baselines (see openomi_baselines.py),
+    then folds it into them. Returns None if scoring failed.
+    """
+    global _baseline_store
+    try:
+        import openomi_baselines
+        with _baseline_lock:
+            if _baseline_store is None:
+                _baseline_store = openomi_baselines.BaselineStore.load(BASELINES_PATH)
+            scores = _baseline_store.score(extraction, program_code)
+            # Only this statement is written back, merged into the file's current contents,
+            # so other containers' updates since our last read are kept
+            delta = openomi_baselines.BaselineStore()
+            delta.update(extraction, program_code)
+            _baseline_store = openomi_baselines.merge_into(BASELINES_PATH, delta)
+        return scores
+    except Exception as e:
+        print(f"WARNING: Could not score against population baselines: {e}")
+        return None
+
+@openomi_profiling.profiled
+def run_extraction_from_s3(file_key: str, program_code: str | None = None) -> dict:
+    """
+    Runs the Parse/Extract flow on a file stored in S3 (see openomi_engine.py),
+    then feeds the optional warehouse and population baselines.
+    """
+    extraction = engine.extract(file_key)
+    if 'error' in extraction:
+        return extraction
+
+    if WAREHOUSE_DIR:
+        store_in_warehouse(extraction, file_key)
+    if BASELINES_PATH:
+        scores = score_against_baselines(extraction, program_code)
+        if scores is not None:
+            extraction['anomaly_baseline'] = scores
+    return extraction
 
+def get_request_property(event, name: str):
+    """Returns a named property from the requestBody (dict or list form) or parameters[]."""
+    request_body = event.get('requestBody') or {}
+    app_json = request_body.get('content', {}).get('application/json', {})
+    items = app_json.get('properties', []) if isinstance(app_json, dict) else app_json
+    for item in list(items or []) + list(event.get('parameters') or []):
+        if isinstance(item, dict) and item.get('name') == name:
+            return item.get('value')
+    return None
+
+@openomi_profiling.profiled
 def lambda_handler(event, context):
     """
     Main handler for Bedrock Agent.
     Supports both requestBody and parameters formats with extensive logging.
     """
+    if RECORD_DIR:
+        openomi_recorder.start(event, context)
+
     # ===== LOG EVERYTHING FOR DEBUGGING =====
     print(f"===== FULL EVENT RECEIVED =====")
     print(json.dumps(event, indent=2, default=str))
@@ -88,61 +113,16 @@ def lambda_handler(event, context):
     response_body = {}
     
     if api_path == '/extract_document':
-        file_key = None
-        
         try:
-            # ===== requestBody (Bedrock Agent with OpenAPI) =====
-            request_body = event.get('requestBody')
-            print(f"requestBody type: {type(request_body)}")
-            print(f"requestBody content: {request_body}")
-            
-            if request_body:
-                content = request_body.get('content', {})
-                print(f"content type: {type(content)}")
-                print(f"content: {content}")
-                
-                app_json = content.get('application/json', {})
-                print(f"application/json type: {type(app_json)}")
-                print(f"application/json: {app_json}")
-                
-                # Iterate safely
-                if isinstance(app_json, dict):
-                    properties = app_json.get('properties', [])
-                    print(f"properties type: {type(properties)}")
-                    print(f"properties: {properties}")
-                    
-                    if isinstance(properties, list):
-                        for item in properties:
-                            print(f"item: {item}")
-                            if isinstance(item, dict) and item.get('name') == 'file_key':
-                                file_key = item.get('value')
-                                print(f"Found file_key in requestBody: {file_key}")
-                                break
-                # FIX: Also handle if it's directly a list (backward compatibility)
-                elif isinstance(app_json, list):
-                    for item in app_json:
-                        if isinstance(item, dict) and item.get('name') == 'file_key':
-                            file_key = item.get('value')
-                            print(f"Found file_key in requestBody (list): {file_key}")
-                            break
-            
-            # ===== parameters[] (fallback) =====
-            if file_key is not None:
-                parameters = event.get('parameters', [])
-                print(f"parameters: {parameters}")
-                
-                if isinstance(parameters, list):
-                    for param in parameters:
-                        if isinstance(param, dict):
-                            if param.get('name') == 'file_key':
-                                file_key = param.get('value')
-                                print(f"Found file_key in parameters: {file_key}")
-                                break
+            # requestBody (Bedrock Agent with OpenAPI, dict or list form), then parameters[]
+            file_key = get_request_property(event, 'file_key')
+            print(f"file_key: {file_key}")
             
             # ===== EXECUTE EXTRACTION =====
             if file_key:
-                print(f"Starting extraction for: {file_key}")
-                extraction_result = run_extraction_from_s3(file_key)
+                program_code = get_request_property(event, 'program_code')
+                print(f"Starting extraction for: {file_key} (program: {program_code})")
+                extraction_result = run_extraction_from_s3(file_key, program_code)
                 response_body = extraction_result
             else:
                 print(f"file_key not found in event")
@@ -180,5 +160,8 @@ def lambda_handler(event, context):
     print(f"===== RESPONSE TO AGENT =====")
     print(json.dumps(api_response, indent=2))
     print(f"===== END OF RESPONSE =====")
+
+    if RECORD_DIR:
+        openomi_recorder.finish(api_response, engine.s3_client)
     
     return api_response
\ No newline at end of file
@@ -0,0 +1,194 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, so max RSS is not reported
+    resource = None
+from datetime import datetime, timezone
+
+# Local directory or s3://bucket/prefix for profile artifacts. On Lambda a local directory is the
+# container's own /tmp, so the summary is also written to the log there.
+PROFILE_DIR = os.environ.get('OPENOMI_PROFILE_DIR') or '/tmp/openomi-profiles'
+ON_LAMBDA = bool(os.environ.get('AWS_LAMBDA_FUNCTION_NAME'))
+
+# Fraction of invocations profiled without being asked to (0 = only on request)
+PROFILE_SAMPLE_RATE = float(os.environ.get('OPENOMI_PROFILE_SAMPLE_RATE', '0'))
+
+# Event key (top level, sessionAttributes or promptSessionAttributes) that turns profiling on
+PROFILE_FLAG = 'openomi_profile'
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 10
+
+_state = threading.local()
+# tracemalloc is process-wide, so only one invocation is profiled at a time
+_profile_lock = threading.Lock()
+_s3_client = None
+
+
+def _is_truthy(value) -> bool:
+    return value is True or str(value).lower() in ('1', 'true', 'yes')
+
+
+def requested(event) -> bool:
+    """True if the event asks for a profile, or if this invocation is sampled."""
+    if isinstance(event, dict):
+        if _is_truthy(event.get(PROFILE_FLAG)):
+            return True
+        for attributes in (event.get('sessionAttributes'), event.get('promptSessionAttributes')):
+            if isinstance(attributes, dict) and _is_truthy(attributes.get(PROFILE_FLAG)):
+                return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _write_artifact(name: str, data: bytes) -> str:
+    global _s3_client
+    if PROFILE_DIR.startswith('s3://'):
+        import boto3
+        if _s3_client is None:
+            _s3_client = boto3.client('s3')
+        bucket, _, prefix = PROFILE_DIR[len('s3://'):].partition('/')
+        key = f"{prefix.rstrip('/')}/{name}".lstrip('/')
+        _s3_client.put_object(Bucket=bucket, Key=key, Body=data)
+        return f"s3://{bucket}/{key}"
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def _max_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _top_functions(profiler: cProfile.Profile) -> list[dict]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    stats.sort_stats('cumulative')
+    top = []
+    for (filename, line, function), (_, ncalls, tottime, cumtime, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]:
+        top.append({
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'ncalls': ncalls,
+            'tottime_seconds': round(tottime, 6),
+            'cumtime_seconds': round(cumtime, 6),
+        })
+    return top
+
+
+def _top_allocations(snapshot) -> list[dict]:
+    top = []
+    for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+        frame = stat.traceback[0]
+        top.append({'location': f"{frame.filename}:{frame.lineno}", 'size_bytes': stat.size, 'count': stat.count})
+    return top
+
+
+class Profile:
+    """CPU profile (cProfile) and allocation trace (tracemalloc) of one invocation."""
+
+    def __init__(self, label: str, request_id: str):
+        self.label = label
+        self.request_id = request_id
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.disable()
+        wall_seconds = time.perf_counter() - self.wall_start
+        cpu_seconds = time.process_time() - self.cpu_start
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        try:
+            base = f"{self.started_at.strftime('%Y%m%dT%H%M%S')}-{self.request_id}-{self.label}"
+            stats_path = _write_artifact(f"{base}.prof", self._dump_stats())
+            summary = {
+                'request_id': self.request_id,
+                'label': self.label,
+                'started_at': self.started_at.isoformat(),
+                'wall_seconds': round(wall_seconds, 4),
+                'cpu_seconds': round(cpu_seconds, 4),
+                'max_rss_mb': _max_rss_mb(),
+                'tracemalloc_peak_mb': round(peak_bytes / (1024 * 1024), 2),
+                'tracemalloc_current_mb': round(current_bytes / (1024 * 1024), 2),
+                'failed': exc_type is not None,
+                'cpu_profile': stats_path,
+                'top_functions': _top_functions(self.profiler),
+                'top_allocations': _top_allocations(snapshot),
+            }
+            summary_path = _write_artifact(f"{base}-summary.json", json.dumps(summary, indent=2).encode('utf-8'))
+            if ON_LAMBDA and not PROFILE_DIR.startswith('s3://'):
+                print(f"PROFILE SUMMARY {json.dumps(summary)}")
+            print(f"Profile written: {summary_path} (peak {summary['tracemalloc_peak_mb']} MB, "
+                  f"max RSS {summary['max_rss_mb']} MB, {summary['wall_seconds']}s)")
+        except Exception as e:
+            print(f"WARNING: Could not write profile artifacts: {e}")
+        return False
+
+    def _dump_stats(self) -> bytes:
+        # cProfile can only dump to a path; go through a temp file to get bytes for S3 too
+        with tempfile.NamedTemporaryFile(suffix='.prof') as tmp:
+            self.profiler.dump_stats(tmp.name)
+            tmp.seek(0)
+            return tmp.read()
+
+
+def profiled(fn):
+    """
+    Profiles calls to fn when requested. For a Lambda handler fn(event, context) the event
+    flag and the request id are used; for other functions only the sampling rate applies.
+    The decision is made once, by the outermost profiled call: nested profiled functions
+    run inside that call's profile (or unprofiled) and never draw their own sample, so
+    OPENOMI_PROFILE_SAMPLE_RATE is the rate of profiled invocations. Concurrent calls run
+    unprofiled while another profile is active. When profiling is not requested the only
+    cost is the flag lookup.
+    """
+    label = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if getattr(_state, 'request_id', None) is not None:
+            return fn(*args, **kwargs)
+        event = args[0] if args and isinstance(args[0], dict) else None
+        context = args[1] if len(args) > 1 else None
+        _state.request_id = getattr(context, 'aws_request_id', None) or uuid.uuid4().hex[:12]
+        try:
+            if not requested(event) or not _profile_lock.acquire(blocking=False):
+                return fn(*args, **kwargs)
+            try:
+                with Profile(label, _state.request_id):
+                    return fn(*args, **kwargs)
+            finally:
+                _profile_lock.release()
+        finally:
+            _state.request_id = None
+
+    return wrapper
+
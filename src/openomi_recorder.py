@@ -0,0 +1,253 @@
+import copy
+import hashlib
+import hmac
+import io
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+
+# Local directory or s3://bucket/prefix where recordings are written. Recording is off when unset.
+RECORD_DIR = os.environ.get('OPENOMI_RECORD_DIR')
+
+# Key of the redaction tokens. With one secret per deployment, tokens of the same session or
+# file line up across containers. Without it each container draws a random key, so tokens only
+# line up within that container.
+_TOKEN_KEY = os.environ.get('OPENOMI_RECORD_SECRET', '').encode('utf-8') or secrets.token_bytes(32)
+
+REDACTED_HOLDER = 'REDACTED HOLDER'
+
+# Event fields that may carry identifiers or free text typed by an officer
+_EVENT_ID_FIELDS = ('sessionId',)
+_EVENT_TEXT_FIELDS = ('inputText',)
+_EVENT_ATTRIBUTE_FIELDS = ('sessionAttributes', 'promptSessionAttributes')
+
+# Account/card-like numbers: 5+ digits, possibly grouped with single spaces or dashes
+_LONG_NUMBER = re.compile(r'\d(?:[ -]?\d){4,}')
+
+# Free-text extraction fields (counterparties, addresses, references) are replaced by tokens
+_TOKENIZED_FIELDS = ('description', 'date')
+_TOKEN = re.compile(r'^tok-[0-9a-f]{12}$')
+
+_current = threading.local()
+
+
+def _token(value) -> str:
+    """
+    Keyed (HMAC-SHA256) stand-in, stable for one key so recordings of one session/file still
+    line up. Without the key, a token cannot be checked against guessed names or numbers.
+    """
+    return hmac.new(_TOKEN_KEY, str(value).encode('utf-8'), hashlib.sha256).hexdigest()[:12]
+
+
+def redact_file_key(file_key: str) -> str:
+    _, ext = os.path.splitext(str(file_key))
+    return f"redacted-{_token(file_key)}{ext}"
+
+
+def _mask_digits(match) -> str:
+    """Masks every digit of a number but the last 4, keeping its separators."""
+    number = match.group()
+    keep = len(re.sub(r'\D', '', number)) - 4
+    masked = []
+    for c in number:
+        if c.isdigit() and keep > 0:
+            masked.append('X')
+            keep -= 1
+        else:
+            masked.append(c)
+    return ''.join(masked)
+
+
+def tokenize(value):
+    """Stable token for a free-text value. Tokens are left as they are, so redaction is idempotent."""
+    if value is None or value == '' or (isinstance(value, str) and _TOKEN.match(value)):
+        return value
+    return f"tok-{_token(value)}"
+
+
+def redact_markdown(markdown) -> str:
+    """The parse output is the document's full text; only its size is kept."""
+    if not markdown:
+        return markdown
+    return f"<redacted markdown: {len(markdown)} chars>"
+
+
+def redact_text(text: str, names: list[str] = ()) -> str:
+    """Masks account-like numbers (keeps the last 4 digits) and known names."""
+    if not isinstance(text, str):
+        return text
+    text = _LONG_NUMBER.sub(_mask_digits, text)
+    for name in names:
+        if name:
+            text = re.sub(re.escape(name), REDACTED_HOLDER, text, flags=re.IGNORECASE)
+    return text
+
+
+def _redact_properties(items):
+    for item in items or []:
+        if isinstance(item, dict) and item.get('name') == 'file_key' and item.get('value'):
+            item['value'] = redact_file_key(item['value'])
+
+
+def redact_event(event: dict) -> dict:
+    """
+    Copy of a Bedrock Agent event with identifiers and free text removed.
+    The structure (requestBody dict/list form, parameters[]) is kept intact, since that
+    is what the handler has to parse.
+    """
+    event = copy.deepcopy(event)
+    for field in _EVENT_ID_FIELDS:
+        if event.get(field):
+            event[field] = _token(event[field])
+    for field in _EVENT_TEXT_FIELDS:
+        if event.get(field):
+            event[field] = f"<redacted {len(event[field])} chars>"
+    for field in _EVENT_ATTRIBUTE_FIELDS:
+        if isinstance(event.get(field), dict):
+            event[field] = {key: '<redacted>' for key in event[field]}
+    if isinstance(event.get('agent'), dict):
+        event['agent'] = {key: _token(value) if key in ('id', 'alias') else value for key, value in event['agent'].items()}
+
+    content = (event.get('requestBody') or {}).get('content', {})
+    app_json = content.get('application/json') if isinstance(content, dict) else None
+    if isinstance(app_json, dict):
+        _redact_properties(app_json.get('properties'))
+    elif isinstance(app_json, list):
+        _redact_properties(app_json)
+    _redact_properties(event.get('parameters'))
+    return event
+
+
+def redact_extraction(extraction, names: list[str] = ()):
+    if isinstance(extraction, dict):
+        redacted = {}
+        for key, value in extraction.items():
+            if key == 'account_holder' and value:
+                redacted[key] = REDACTED_HOLDER
+            elif key in _TOKENIZED_FIELDS:
+                redacted[key] = tokenize(value)
+            elif key == 'markdown':
+                redacted[key] = redact_markdown(value)
+            else:
+                redacted[key] = redact_extraction(value, names)
+        return redacted
+    if isinstance(extraction, list):
+        return [redact_extraction(item, names) for item in extraction]
+    return redact_text(extraction, names)
+
+
+class Recording:
+    """Everything observed during one lambda_handler invocation."""
+
+    def __init__(self, event: dict, context):
+        self.request_id = getattr(context, 'aws_request_id', None) or _token(time.time())
+        self.started = time.perf_counter()
+        self.recorded_at = datetime.now(timezone.utc).isoformat()
+        self.raw_event = event
+        self.names = []
+        self.calls = []
+
+    def add_call(self, service: str, op: str, seconds: float, response=None, **details):
+        self.calls.append({'service': service, 'op': op, 'seconds': round(seconds, 4), 'response': response, **details})
+
+    def to_dict(self, response: dict) -> dict:
+        body = response.get('response', {}).get('responseBody', {}).get('application/json', {}).get('body')
+        try:
+            body = redact_extraction(json.loads(body), self.names)
+        except (TypeError, ValueError):
+            pass
+        return {
+            'request_id': self.request_id,
+            'recorded_at': self.recorded_at,
+            'handler_seconds': round(time.perf_counter() - self.started, 4),
+            'event': redact_event(self.raw_event),
+            'calls': [{**call, 'response': redact_extraction(call['response'], self.names)} for call in self.calls],
+            'response_body': body,
+        }
+
+
+def current() -> Recording | None:
+    return getattr(_current, 'recording', None)
+
+
+def start(event: dict, context) -> Recording:
+    recording = Recording(event, context)
+    _current.recording = recording
+    return recording
+
+
+def finish(response: dict, s3_client=None):
+    """Writes the invocation's recording to RECORD_DIR. Never fails the invocation."""
+    recording = current()
+    _current.recording = None
+    if recording is None or not RECORD_DIR:
+        return
+    try:
+        name = f"{recording.recorded_at[:19].replace(':', '')}-{recording.request_id}.json"
+        data = json.dumps(recording.to_dict(response), default=str)
+        if RECORD_DIR.startswith('s3://'):
+            bucket, _, prefix = RECORD_DIR[len('s3://'):].partition('/')
+            s3_client.put_object(Bucket=bucket, Key=f"{prefix.rstrip('/')}/{name}".lstrip('/'), Body=data.encode('utf-8'))
+        else:
+            os.makedirs(RECORD_DIR, exist_ok=True)
+            with open(os.path.join(RECORD_DIR, name), 'w') as f:
+                f.write(data)
+        print(f"Recorded invocation to {RECORD_DIR}/{name}")
+    except Exception as e:
+        print(f"WARNING: Could not write recording: {e}")
+
+
+class RecordingADE:
+    """Wraps the ADE client and records every parse/extract response and its latency."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def parse(self, **kwargs):
+        start_time = time.perf_counter()
+        response = self.inner.parse(**kwargs)
+        recording = current()
+        if recording is not None:
+            recording.add_call('ade', 'parse', time.perf_counter() - start_time,
+                               {'markdown': redact_markdown(getattr(response, 'markdown', None))},
+                               model=kwargs.get('model'))
+        return response
+
+    def extract(self, **kwargs):
+        start_time = time.perf_counter()
+        response = self.inner.extract(**kwargs)
+        recording = current()
+        if recording is not None:
+            extraction = getattr(response, 'extraction', None)
+            if isinstance(extraction, dict) and extraction.get('account_holder'):
+                recording.names.append(str(extraction['account_holder']))
+            recording.add_call('ade', 'extract', time.perf_counter() - start_time,
+                               {'extraction': extraction}, model=kwargs.get('model'))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+class RecordingS3:
+    """Wraps the S3 client and records download sizes and latencies (not the documents)."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def get_object(self, Bucket, Key, **kwargs):
+        start_time = time.perf_counter()
+        response = self.inner.get_object(Bucket=Bucket, Key=Key, **kwargs)
+        data = response['Body'].read()
+        recording = current()
+        if recording is not None:
+            recording.add_call('s3', 'get_object', time.perf_counter() - start_time,
+                               bytes=len(data), suffix=os.path.splitext(Key)[1])
+        return {**response, 'Body': io.BytesIO(data)}
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
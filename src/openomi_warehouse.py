@@ -0,0 +1,426 @@
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import unicodedata
+from datetime import date, datetime, timedelta, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError as e:
+    raise ImportError("The transaction warehouse needs pyarrow. Add it to the Lambda layer "
+                      "(layer/requirements.txt) or run: pip install pyarrow") from e
+
+# Root of the Parquet warehouse: s3://bucket/prefix (shared by all Lambda containers) or a
+# local/mounted directory. Ingestion is skipped when unset.
+WAREHOUSE_DIR = os.environ.get('OPENOMI_WAREHOUSE_DIR')
+
+COMPACTED_NAME = 'compacted.parquet'
+
+# Amounts that are a multiple of this many cents count as "round" (default: $100)
+ROUND_UNIT_CENTS = int(os.environ.get('OPENOMI_ROUND_UNIT_CENTS', '10000'))
+
+ROW_GROUP_SIZE = 64 * 1024
+
+# Files are sorted on these columns so the Parquet row-group min/max
+# statistics act as a sparse index for counterparty, amount and date lookups.
+SORT_KEYS = [('counterparty', 'ascending'), ('amount_cents', 'ascending'), ('txn_date', 'ascending')]
+
+SCHEMA = pa.schema([
+    ('ingested_at', pa.timestamp('ms', tz='UTC')),
+    ('applicant_id', pa.string()),
+    ('file_key', pa.string()),
+    ('account_holder', pa.string()),
+    ('currency', pa.string()),
+    ('txn_index', pa.int32()),
+    ('txn_date', pa.date32()),
+    ('raw_date', pa.string()),
+    ('description', pa.string()),
+    ('counterparty', pa.string()),
+    ('amount', pa.float64()),
+    ('amount_cents', pa.int64()),
+    ('is_round', pa.bool_()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('ingest_date', pa.string())]), flavor='hive')
+
+# Banking boilerplate that hides who the money actually came from / went to
+_COUNTERPARTY_NOISE = re.compile(
+    r'\b(E ?TRANSFER|INTERAC|DEPOSIT|TRANSFER|TRF|FROM|TO|PAYMENT|PMT|POS|ATM|REF|ONLINE|MOBILE|'
+    r'BRANCH|WIRE|INCOMING|OUTGOING|CREDIT|DEBIT|CHQ|CHEQUE|CHECK|MR|MRS|MS|DR)\b'
+)
+
+_DATE_FORMATS = [
+    '%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y', '%d/%m/%Y', '%m-%d-%Y', '%d-%m-%Y', '%m/%d/%y',
+    '%b %d, %Y', '%b %d %Y', '%d %b %Y', '%B %d, %Y', '%B %d %Y', '%d %B %Y', '%d-%b-%Y',
+]
+
+
+def normalize_counterparty(description: str) -> str:
+    """
+    Reduces a transaction description to a comparable counterparty name.
+    Strips accents, reference numbers, punctuation and banking boilerplate so that
+    "E-TRANSFER FROM Jean Dupont #88412" and "Interac e-Transfer - JEAN DUPONT" match.
+    """
+    if not description:
+        return ''
+    text = unicodedata.normalize('NFKD', str(description))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).upper()
+    text = re.sub(r'[^A-Z0-9 ]+', ' ', text)
+    text = ' '.join(token for token in text.split() if not any(c.isdigit() for c in token))
+    cleaned = _COUNTERPARTY_NOISE.sub(' ', text)
+    cleaned = ' '.join(cleaned.split())
+    return cleaned or ' '.join(text.split())
+
+
+def parse_date(value) -> date | None:
+    """Parses the free-text date returned by the extraction. Returns None if unrecognised."""
+    if not value:
+        return None
+    text = ' '.join(str(value).replace('.', '').split())
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def to_cents(amount) -> int | None:
+    try:
+        return int(round(float(amount) * 100))
+    except (TypeError, ValueError):
+        return None
+
+
+def _rows_from_extraction(extraction: dict, file_key: str, applicant_id: str | None, ingested_at: datetime) -> list[dict]:
+    account_holder = extraction.get('account_holder') or ''
+    applicant_id = applicant_id or normalize_counterparty(account_holder) or file_key
+    currency = (extraction.get('currency') or '').upper()
+
+    rows = []
+    for idx, txn in enumerate(extraction.get('transactions') or []):
+        if not isinstance(txn, dict):
+            continue
+        cents = to_cents(txn.get('amount'))
+        if cents is None:
+            continue
+        description = txn.get('description') or ''
+        rows.append({
+            'ingested_at': ingested_at,
+            'applicant_id': applicant_id,
+            'file_key': file_key,
+            'account_holder': account_holder,
+            'currency': currency,
+            'txn_index': idx,
+            'txn_date': parse_date(txn.get('date')),
+            'raw_date': str(txn.get('date') or ''),
+            'description': description,
+            'counterparty': normalize_counterparty(description),
+            'amount': cents / 100,
+            'amount_cents': cents,
+            'is_round': cents != 0 and cents % ROUND_UNIT_CENTS == 0,
+        })
+    return rows
+
+
+def _filesystem(root: str):
+    """(filesystem, base path) for an s3:// URI or a local directory."""
+    if '://' in root:
+        return pafs.FileSystem.from_uri(root)
+    return pafs.LocalFileSystem(), os.path.abspath(root)
+
+
+def _parquet_files(fs, partition_dir: str) -> list[str]:
+    selector = pafs.FileSelector(partition_dir, allow_not_found=True)
+    return sorted(info.path for info in fs.get_file_info(selector)
+                  if info.type == pafs.FileType.File and info.base_name.endswith('.parquet')
+                  and not info.base_name.startswith(('.', '_')))
+
+
+def _write_partition_file(table, fs, partition_dir: str, name: str) -> str:
+    fs.create_dir(partition_dir, recursive=True)
+    final_path = posixpath.join(partition_dir, name)
+    table = table.sort_by(SORT_KEYS)
+    if isinstance(fs, pafs.LocalFileSystem):
+        tmp_path = posixpath.join(partition_dir, '.' + name + '.tmp')  # hidden from readers until renamed
+        pq.write_table(table, tmp_path, filesystem=fs, row_group_size=ROW_GROUP_SIZE, compression='zstd')
+        fs.move(tmp_path, final_path)
+    else:
+        # An S3 PUT only becomes visible once complete, so no temp object is needed
+        pq.write_table(table, final_path, filesystem=fs, row_group_size=ROW_GROUP_SIZE, compression='zstd')
+    return final_path
+
+
+def _latest_ingestions(dataset):
+    """file_key -> ingested_at of its latest ingestion, from a two-column projection of the dataset."""
+    return dataset.to_table(columns=['file_key', 'ingested_at']).group_by('file_key').aggregate(
+        [('ingested_at', 'max')])
+
+
+def _latest_only(table, latest):
+    """
+    Drops rows superseded by a later ingestion of the same file_key (an agent retry), wherever
+    that later ingestion landed. `latest` must cover the whole warehouse, not just `table`.
+    """
+    if table.num_rows == 0:
+        return table
+    columns = table.column_names
+    joined = table.join(latest, keys='file_key', join_type='inner')
+    joined = joined.filter(pc.equal(joined['ingested_at'], joined['ingested_at_max']))
+    return joined.select(columns)
+
+
+def append_extraction(extraction: dict, file_key: str, applicant_id: str | None = None,
+                      ingest_date: date | None = None, root: str | None = None) -> int:
+    """
+    Appends the transactions of one extraction to the warehouse.
+    Each file_key gets its own file under <root>/ingest_date=YYYY-MM-DD/, so ingestion never
+    rewrites other data and a same-day retry replaces its earlier file; a later-day retry
+    supersedes it at query time. Returns the number of transactions written.
+    """
+    root = root or WAREHOUSE_DIR
+    if not root:
+        raise ValueError("No warehouse directory configured. Set OPENOMI_WAREHOUSE_DIR.")
+
+    ingested_at = datetime.now(timezone.utc)
+    ingest_date = ingest_date or ingested_at.date()
+    rows = _rows_from_extraction(extraction, file_key, applicant_id, ingested_at)
+    if not rows:
+        return 0
+
+    fs, base = _filesystem(root)
+    table = pa.Table.from_pylist(rows, schema=SCHEMA)
+    name = f"part-{hashlib.sha256(file_key.encode('utf-8')).hexdigest()[:16]}.parquet"
+    path = _write_partition_file(table, fs, posixpath.join(base, f"ingest_date={ingest_date.isoformat()}"), name)
+    print(f"Warehouse: wrote {len(rows)} transactions to {path}")
+    return len(rows)
+
+
+def compact(ingest_date: date | str, root: str | None = None) -> str | None:
+    """
+    Merges the files of one ingest_date partition into a single sorted file, dropping rows
+    superseded by a later ingestion of the same file_key. Only run it on closed partitions,
+    from a single scheduled job or the CLI: it deletes the files it merged, which queries
+    running at the same time may still be reading.
+    """
+    root = root or WAREHOUSE_DIR
+    fs, base = _filesystem(root)
+    partition_dir = posixpath.join(base, f"ingest_date={ingest_date}")
+    old_files = _parquet_files(fs, partition_dir)
+    if not old_files:
+        return None
+
+    latest = _latest_ingestions(_dataset(root))
+    merged = ds.dataset(old_files, schema=SCHEMA, format='parquet', filesystem=fs).to_table()
+    table = _latest_only(merged, latest)
+    if len(old_files) == 1 and table.num_rows == merged.num_rows:
+        return old_files[0]
+    if table.num_rows == 0:
+        # Every file here was re-ingested later
+        for path in old_files:
+            fs.delete_file(path)
+        print(f"Warehouse: removed {len(old_files)} superseded files from {partition_dir}")
+        return None
+    new_path = _write_partition_file(table, fs, partition_dir, COMPACTED_NAME)
+    for path in old_files:
+        if path != new_path:
+            fs.delete_file(path)
+    print(f"Warehouse: compacted {len(old_files)} files into {new_path}")
+    return new_path
+
+
+def compact_closed(root: str | None = None, before: date | None = None) -> list[str | None]:
+    """
+    Compacts every partition older than `before` (default: yesterday, so no writer is still active).
+    Meant for a daily scheduled job (cron, EventBridge) running `openomi_warehouse.py compact`.
+    """
+    root = root or WAREHOUSE_DIR
+    before = before or datetime.now(timezone.utc).date() - timedelta(days=1)
+    fs, base = _filesystem(root)
+    compacted = []
+    for info in fs.get_file_info(pafs.FileSelector(base, allow_not_found=True)):
+        if info.type != pafs.FileType.Directory or not info.base_name.startswith('ingest_date='):
+            continue
+        partition = info.base_name[len('ingest_date='):]
+        try:
+            closed = date.fromisoformat(partition) < before
+        except ValueError:
+            continue
+        if closed:
+            compacted.append(compact(partition, root=root))
+    return compacted
+
+
+def _dataset(root: str | None = None):
+    root = root or WAREHOUSE_DIR
+    if not root:
+        return None
+    fs, base = _filesystem(root)
+    if fs.get_file_info(base).type == pafs.FileType.NotFound:
+        return None
+    return ds.dataset(base, schema=SCHEMA, format='parquet', partitioning=PARTITIONING, filesystem=fs,
+                      ignore_prefixes=['.', '_'])
+
+
+def _query(filter_expr, columns=None, root: str | None = None):
+    dataset = _dataset(root)
+    if dataset is None:
+        table = pa.Table.from_pylist([], schema=SCHEMA)
+    else:
+        read_columns = None
+        if columns:
+            read_columns = list(dict.fromkeys(list(columns) + ['file_key', 'ingested_at']))
+        # Resolve each file's latest ingestion over the whole warehouse before filtering, so a
+        # superseded row is dropped even when its replacement no longer matches the filter
+        latest = _latest_ingestions(dataset)
+        table = _latest_only(dataset.to_table(filter=filter_expr, columns=read_columns), latest)
+    return table.select(columns) if columns else table
+
+
+def _since_filter(expr, since: date | None):
+    if since is not None:
+        expr = expr & (ds.field('txn_date') >= pa.scalar(since, pa.date32()))
+    return expr
+
+
+def find_counterparty(name: str, root: str | None = None) -> list[dict]:
+    """Returns every transaction whose normalized counterparty matches `name`."""
+    expr = ds.field('counterparty') == normalize_counterparty(name)
+    return _query(expr, root=root).sort_by([('txn_date', 'ascending')]).to_pylist()
+
+
+def find_amount(amount: float, txn_date: date | None = None, tolerance: float = 0.0,
+                root: str | None = None) -> list[dict]:
+    """Returns every transaction of `amount` (+/- tolerance), optionally on a given date."""
+    cents = to_cents(amount)
+    slack = to_cents(tolerance) or 0
+    expr = (ds.field('amount_cents') >= cents - slack) & (ds.field('amount_cents') <= cents + slack)
+    if txn_date is not None:
+        expr = expr & (ds.field('txn_date') == pa.scalar(txn_date, pa.date32()))
+    return _query(expr, root=root).sort_by([('txn_date', 'ascending')]).to_pylist()
+
+
+def shared_counterparties(min_applicants: int = 2, deposits_only: bool = True,
+                          since: date | None = None, root: str | None = None) -> list[dict]:
+    """
+    Finds counterparties that appear in the statements of several applicants,
+    e.g. the same depositor funding multiple files.
+    """
+    expr = ds.field('counterparty') != ''
+    if deposits_only:
+        expr = expr & (ds.field('amount_cents') > 0)
+    expr = _since_filter(expr, since)
+    table = _query(expr, columns=['counterparty', 'applicant_id', 'amount'], root=root)
+    if table.num_rows == 0:
+        return []
+
+    grouped = table.group_by('counterparty').aggregate([
+        ('applicant_id', 'count_distinct'),
+        ('applicant_id', 'distinct'),
+        ('amount', 'sum'),
+        ('amount', 'count'),
+    ])
+    grouped = grouped.filter(pc.field('applicant_id_count_distinct') >= min_applicants)
+    grouped = grouped.sort_by([('applicant_id_count_distinct', 'descending'), ('amount_sum', 'descending')])
+    return [
+        {
+            'counterparty': row['counterparty'],
+            'applicants': row['applicant_id_count_distinct'],
+            'applicant_ids': row['applicant_id_distinct'],
+            'transactions': row['amount_count'],
+            'total_amount': round(row['amount_sum'], 2),
+        }
+        for row in grouped.to_pylist()
+    ]
+
+
+def shared_round_amounts(min_applicants: int = 2, min_amount: float = 1000.0, deposits_only: bool = True,
+                         since: date | None = None, root: str | None = None) -> list[dict]:
+    """
+    Finds round amounts moving on the same day across several applicants,
+    e.g. the same $10,000 deposited into three accounts on one date.
+    """
+    expr = ds.field('is_round') & ds.field('txn_date').is_valid()
+    if deposits_only:
+        expr = expr & (ds.field('amount_cents') >= to_cents(min_amount))
+    else:
+        expr = expr & (pc.abs(ds.field('amount_cents')) >= to_cents(min_amount))
+    expr = _since_filter(expr, since)
+    table = _query(expr, columns=['txn_date', 'amount_cents', 'applicant_id', 'counterparty'], root=root)
+    if table.num_rows == 0:
+        return []
+
+    grouped = table.group_by(['txn_date', 'amount_cents']).aggregate([
+        ('applicant_id', 'count_distinct'),
+        ('applicant_id', 'distinct'),
+        ('counterparty', 'distinct'),
+    ])
+    grouped = grouped.filter(pc.field('applicant_id_count_distinct') >= min_applicants)
+    grouped = grouped.sort_by([('applicant_id_count_distinct', 'descending'), ('amount_cents', 'descending')])
+    return [
+        {
+            'date': row['txn_date'].isoformat(),
+            'amount': row['amount_cents'] / 100,
+            'applicants': row['applicant_id_count_distinct'],
+            'applicant_ids': row['applicant_id_distinct'],
+            'counterparties': row['counterparty_distinct'],
+        }
+        for row in grouped.to_pylist()
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the Openomi transaction warehouse.")
+    parser.add_argument('--root', default=WAREHOUSE_DIR,
+                        help="Warehouse directory or s3://bucket/prefix (default: $OPENOMI_WAREHOUSE_DIR)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('counterparty', help="Transactions with a given counterparty")
+    cmd.add_argument('name')
+
+    cmd = commands.add_parser('amount', help="Transactions of a given amount")
+    cmd.add_argument('amount', type=float)
+    cmd.add_argument('--date', type=date.fromisoformat)
+    cmd.add_argument('--tolerance', type=float, default=0.0)
+
+    cmd = commands.add_parser('shared-counterparties', help="Counterparties seen across several applicants")
+    cmd.add_argument('--min-applicants', type=int, default=2)
+    cmd.add_argument('--since', type=date.fromisoformat)
+
+    cmd = commands.add_parser('shared-amounts', help="Same round amount on the same day across applicants")
+    cmd.add_argument('--min-applicants', type=int, default=2)
+    cmd.add_argument('--min-amount', type=float, default=1000.0)
+    cmd.add_argument('--since', type=date.fromisoformat)
+
+    cmd = commands.add_parser('compact', help="Merge the files of one ingest_date partition (default: all closed ones)")
+    cmd.add_argument('ingest_date', nargs='?')
+
+    args = parser.parse_args(argv)
+    if not args.root:
+        parser.error("No warehouse directory. Pass --root or set OPENOMI_WAREHOUSE_DIR.")
+
+    if args.command == 'counterparty':
+        result = find_counterparty(args.name, root=args.root)
+    elif args.command == 'amount':
+        result = find_amount(args.amount, args.date, args.tolerance, root=args.root)
+    elif args.command == 'shared-counterparties':
+        result = shared_counterparties(args.min_applicants, since=args.since, root=args.root)
+    elif args.command == 'shared-amounts':
+        result = shared_round_amounts(args.min_applicants, args.min_amount, since=args.since, root=args.root)
+    elif args.ingest_date:
+        result = compact(args.ingest_date, root=args.root)
+    else:
+        result = compact_closed(root=args.root)
+
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
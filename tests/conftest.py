@@ -0,0 +1,14 @@
+import os
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / 'src'))
+sys.path.insert(0, str(REPO_ROOT / 'benchmarks'))
+
+# openomi_logic builds its clients at import time; give them offline settings
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'offline-test')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'offline-test')
+os.environ.setdefault('VISION_AGENT_API_KEY', 'offline-test')
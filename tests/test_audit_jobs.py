@@ -0,0 +1,43 @@
+import time
+
+from audit_jobs import JobQueue
+
+
+def _wait(queue: JobQueue, job_id: str, owner: str, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id, owner)
+        if job.status in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+def test_jobs_are_scoped_to_their_owner():
+    queue = JobQueue(max_workers=1)
+    mine = queue.submit('mine', ['report'], lambda job: {'report': 'A'}, owner='alice')
+    theirs = queue.submit('theirs', ['report'], lambda job: {'report': 'B'}, owner='bob')
+    _wait(queue, mine, 'alice')
+    _wait(queue, theirs, 'bob')
+
+    assert [job.id for job in queue.jobs('alice')] == [mine]
+    assert queue.get(theirs, 'alice') is None
+    assert queue.jobs() == []
+
+    queue.remove(theirs, 'alice')
+    assert queue.get(theirs, 'bob') is not None
+    queue.remove(theirs, 'bob')
+    assert queue.get(theirs, 'bob') is None
+
+
+def test_failed_job_records_error_and_stage():
+    queue = JobQueue(max_workers=1)
+
+    def fail(job):
+        job.update_stage('upload', 0.5)
+        raise RuntimeError('boom')
+
+    job = _wait(queue, queue.submit('bad', ['upload'], fail, owner='alice'), 'alice')
+    assert job.status == 'failed'
+    assert job.error == 'boom'
+    assert job.stages['upload']['status'] == 'failed'
@@ -0,0 +1,167 @@
+import json
+import random
+
+import pytest
+
+import openomi_baselines
+from openomi_baselines import Baseline, BaselineStore, QuantileSketch, first_digit, merge_into
+from standins import LatencyModel, LocalS3
+
+
+def _statement(amounts, currency='CAD'):
+    return {'currency': currency, 'transactions': [{'date': '2024-01-01', 'description': 'x', 'amount': a}
+                                                   for a in amounts]}
+
+
+@pytest.mark.parametrize('value, digit', [
+    (0.3, 3), (0.6, 6), (1, 1), (9.99, 9), (10, 1), (1000, 1), (-250.0, 2), (0.000123, 1), (99999.99, 9),
+])
+def test_first_digit(value, digit):
+    assert first_digit(value) == digit
+
+
+def test_first_digit_of_zero_is_none():
+    assert first_digit(0) is None
+    assert first_digit(float('inf')) is None
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    rnd = random.Random(1)
+    values = sorted(rnd.lognormvariate(6, 1.5) for _ in range(20000))
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.0101
+
+
+def test_sketch_merge_matches_single_sketch():
+    rnd = random.Random(2)
+    values = [rnd.uniform(1, 10000) for _ in range(5000)]
+    whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+    left.merge(right)
+    assert left.count == whole.count
+    assert left.buckets == whole.buckets
+    assert left.quantile(0.95) == whole.quantile(0.95)
+
+
+def test_sketch_round_trips_through_dict():
+    sketch = QuantileSketch()
+    for value in (0, 5, 50, 500):
+        sketch.add(value)
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    assert restored.rank(50) == sketch.rank(50)
+
+
+def test_benford_conformity_needs_enough_digits():
+    scores = BaselineStore().score(_statement([900.0, 950.0]))
+    assert scores['benford']['digits'] == 2
+    assert scores['benford']['conformity'] is None
+
+
+def test_benford_conformity_on_benford_like_statement():
+    rnd = random.Random(3)
+    amounts = [round(10 ** rnd.uniform(1, 5), 2) for _ in range(2000)]
+    scores = BaselineStore().score(_statement(amounts))
+    assert scores['benford']['conformity'] in ('close', 'acceptable')
+
+
+def test_benford_flags_fabricated_amounts():
+    scores = BaselineStore().score(_statement([9000.0 + i for i in range(60)]))
+    assert scores['benford']['conformity'] == 'nonconformity'
+
+
+def test_merge_into_keeps_concurrent_updates(tmp_path):
+    path = str(tmp_path / 'baselines.json')
+    # Two writers each loaded an empty store, then both write back
+    for amounts in ([100.0, 200.0], [300.0]):
+        delta = BaselineStore()
+        delta.update(_statement(amounts), 'FSW-EE')
+        merge_into(path, delta)
+    store = BaselineStore.load(path)
+    baseline = store.baselines[BaselineStore.key('FSW-EE', 'CAD')]
+    assert baseline.statements == 2
+    assert baseline.deposit_sizes.count == 3
+
+
+def test_score_uses_population_percentiles(monkeypatch):
+    monkeypatch.setattr(openomi_baselines, 'MIN_BASELINE_DEPOSITS', 10)
+    store = BaselineStore()
+    rnd = random.Random(4)
+    for _ in range(50):
+        store.update(_statement([round(rnd.uniform(100, 2000), 2) for _ in range(10)]))
+    scores = store.score(_statement([50000.0]))
+    assert scores['largest_deposit']['percentile'] == 1.0
+    assert scores['unusual_deposits'][0]['amount'] == 50000.0
+    assert scores['anomaly_score'] == 1.0
+
+
+def _population(monkeypatch, statements=500):
+    monkeypatch.setattr(openomi_baselines, 'MIN_BASELINE_DEPOSITS', 10)
+    rnd = random.Random(5)
+    store = BaselineStore()
+    for _ in range(statements):
+        store.update(_statement([round(rnd.lognormvariate(6, 1), 2) for _ in range(30)]))
+    return store, rnd
+
+
+def test_ordinary_statements_do_not_look_unusual(monkeypatch):
+    store, rnd = _population(monkeypatch)
+    scored = [store.score(_statement([round(rnd.lognormvariate(6, 1), 2) for _ in range(30)]))
+              for _ in range(200)]
+    largest = sorted(scores['largest_deposit']['percentile'] for scores in scored)
+    assert 0.35 <= largest[len(largest) // 2] <= 0.65
+    # The per-deposit threshold is corrected for the 30 draws, so few statements get a flag
+    assert scored[0]['deposit_flag_percentile'] == round(1 - 0.01 / 30, 6)
+    assert sum(1 for scores in scored if scores['unusual_deposits']) <= 10
+
+
+def test_baseline_files_without_largest_deposits_still_load(monkeypatch):
+    store, _ = _population(monkeypatch, statements=20)
+    data = store.to_dict()
+    for baseline in data.values():
+        del baseline['statement_largest_deposits']
+    restored = BaselineStore.from_dict(data)
+    scores = restored.score(_statement([500.0]))
+    assert scores['largest_deposit']['percentile'] is None
+    assert scores['anomaly_score'] is not None
+    assert Baseline.from_dict(store.to_dict()[BaselineStore.key(None, 'CAD')]).statement_largest_deposits.count == 20
+
+
+def test_merge_into_s3_retries_when_another_writer_got_there_first(monkeypatch):
+    s3 = LocalS3(LatencyModel(0))
+    monkeypatch.setattr(openomi_baselines, '_s3', s3)
+    path = 's3://bucket/baselines/state.json'
+
+    first = BaselineStore()
+    first.update(_statement([100.0]), 'FSW-EE')
+    merge_into(path, first)
+
+    # Another container writes between our read and our conditional write
+    load = openomi_baselines._load_s3
+
+    def racing_load(p):
+        result = load(p)
+        if racing_load.calls == 0:
+            other = BaselineStore()
+            other.update(_statement([200.0]), 'FSW-EE')
+            merged = BaselineStore.from_dict(result[0].to_dict())
+            merged.merge(other)
+            s3.put_object(Bucket='bucket', Key='baselines/state.json', Body=json.dumps(merged.to_dict()))
+        racing_load.calls += 1
+        return result
+    racing_load.calls = 0
+    monkeypatch.setattr(openomi_baselines, '_load_s3', racing_load)
+
+    second = BaselineStore()
+    second.update(_statement([300.0]), 'FSW-EE')
+    merge_into(path, second)
+
+    assert racing_load.calls == 2
+    baseline = BaselineStore.load(path).baselines[BaselineStore.key('FSW-EE', 'CAD')]
+    assert baseline.statements == 3
@@ -0,0 +1,14 @@
+import pytest
+
+from run_benchmarks import percentile
+
+
+@pytest.mark.parametrize('q, expected', [(50, 50), (95, 95), (99, 99), (100, 100), (1, 1)])
+def test_nearest_rank_percentile(q, expected):
+    assert percentile([float(v) for v in range(1, 101)], q) == expected
+
+
+def test_percentile_of_small_samples():
+    assert percentile([], 50) is None
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
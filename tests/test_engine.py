@@ -0,0 +1,74 @@
+import asyncio
+
+from openomi_engine import ExtractionEngine
+from standins import FakeADE, FakeAsyncADE, LatencyModel, LocalS3, make_pdf_bytes
+
+
+def _engine():
+    latency = LatencyModel(0)
+    s3 = LocalS3(latency)
+    ade = FakeADE(latency)
+    engine = ExtractionEngine('bucket', s3_client=s3, ade_client=ade, async_ade_client=FakeAsyncADE(ade))
+    return engine, s3, ade
+
+
+def test_extract_from_s3_key_bytes_and_path(tmp_path):
+    engine, s3, ade = _engine()
+    s3.put('bucket', 'statement.pdf', make_pdf_bytes(2))
+    path = tmp_path / 'local.pdf'
+    path.write_bytes(make_pdf_bytes(1))
+
+    for source in ('statement.pdf', make_pdf_bytes(1), path):
+        assert engine.extract(source)['account_holder'] == 'JANE APPLICANT'
+    assert ade.calls == {'parse': 3, 'extract': 3}
+
+
+def test_extract_reports_errors_instead_of_raising():
+    engine, _, _ = _engine()
+    assert 'error' in engine.extract('missing.pdf')
+
+
+def test_extract_many_async_keeps_order():
+    engine, s3, _ = _engine()
+    for i in range(20):
+        s3.put('bucket', f"doc-{i}.pdf", make_pdf_bytes(1))
+    keys = [f"doc-{i}.pdf" for i in range(20)] + ['missing.pdf']
+    results = asyncio.run(engine.extract_many_async(keys, concurrency=5))
+    assert ['error' in result for result in results] == [False] * 20 + [True]
+
+
+def test_aclose_closes_the_client_the_engine_created():
+    engine = ExtractionEngine('bucket', s3_client=object())
+
+    async def use_and_close():
+        client = engine.async_ade_client
+        assert engine.async_ade_client is client
+        await engine.aclose()
+        return client
+
+    client = asyncio.run(use_and_close())
+    assert client.is_closed()
+
+
+def test_new_event_loop_gets_a_new_client():
+    engine = ExtractionEngine('bucket', s3_client=object())
+
+    async def get():
+        return engine.async_ade_client
+
+    first = asyncio.run(get())
+    second = asyncio.run(get())
+    assert first is not second
+    asyncio.run(engine.aclose())  # not created on this loop: nothing to close
+
+
+def test_injected_async_client_is_left_open():
+    engine, _, ade = _engine()
+    injected = engine._async_ade_client
+
+    async def run():
+        assert engine.async_ade_client is injected
+        await engine.aclose()
+
+    asyncio.run(run())
+    assert engine._async_ade_client is injected
@@ -0,0 +1,88 @@
+import io
+
+from PIL import Image
+
+from image_preprocess import DEFAULT_CONFIG, images_to_pdf, preprocess_image
+from preprocess_accuracy import compare_extractions
+from standins import count_pages
+
+
+def _jpeg(size, exif=False) -> bytes:
+    img = Image.new('RGB', size, 'white')
+    out = io.BytesIO()
+    if exif:
+        data = img.getexif()
+        data[0x0112] = 1  # orientation
+        img.save(out, format='JPEG', quality=95, exif=data)
+    else:
+        img.save(out, format='JPEG', quality=95)
+    return out.getvalue()
+
+
+def test_images_below_the_pixel_floor_keep_their_size():
+    _, data = preprocess_image('page.jpg', _jpeg((3000, 2250), exif=True))
+    assert Image.open(io.BytesIO(data)).size == (3000, 2250)
+
+
+def test_large_images_are_capped_at_max_long_side():
+    _, data = preprocess_image('page.jpg', _jpeg((6000, 4500)))
+    assert max(Image.open(io.BytesIO(data)).size) == DEFAULT_CONFIG['max_long_side']
+
+
+def test_exif_is_stripped_and_color_kept_by_default():
+    _, data = preprocess_image('page.jpg', _jpeg((800, 600), exif=True))
+    img = Image.open(io.BytesIO(data))
+    assert not img.getexif()
+    assert img.mode == 'RGB'
+
+
+def _transparent_png(size) -> bytes:
+    img = Image.new('RGBA', size, (0, 0, 0, 0))  # transparent black, as most exporters leave it
+    img.paste((0, 0, 0, 255), (10, 10, 60, 20))  # a line of opaque black "text"
+    out = io.BytesIO()
+    img.save(out, format='PNG')
+    return out.getvalue()
+
+
+def test_transparent_png_is_flattened_onto_white():
+    _, data = preprocess_image('page.png', _transparent_png((200, 100)))
+    img = Image.open(io.BytesIO(data))
+    assert img.mode == 'RGB'
+    assert img.getpixel((150, 80)) == (255, 255, 255)
+    assert img.getpixel((20, 15)) == (0, 0, 0)
+
+    palette = Image.open(io.BytesIO(_transparent_png((200, 100)))).convert('P')
+    palette.info['transparency'] = palette.getpixel((150, 80))
+    _, data = preprocess_image('page.png', _png_bytes(palette), {'grayscale': True})
+    img = Image.open(io.BytesIO(data))
+    assert img.getpixel((150, 80)) == 255 and img.getpixel((20, 15)) == 0
+
+
+def _png_bytes(img) -> bytes:
+    out = io.BytesIO()
+    img.save(out, format='PNG', transparency=img.info['transparency'])
+    return out.getvalue()
+
+
+def test_transparent_pages_are_flattened_in_the_combined_pdf():
+    pdf = images_to_pdf([('p1.png', _transparent_png((850, 1100)))])
+    # Pillow embeds an RGB page as a single JPEG stream
+    jpeg = pdf[pdf.index(b'\xff\xd8'):pdf.rindex(b'\xff\xd9') + 2]
+    page = Image.open(io.BytesIO(jpeg)).convert('L')
+    assert page.getpixel((400, 600)) > 250
+    assert page.getpixel((30, 15)) < 5
+
+
+def test_combined_pdf_has_every_page():
+    pages = [('p1.jpg', _jpeg((850, 1100))), ('p2.jpg', _jpeg((850, 1100)))]
+    assert count_pages(images_to_pdf(pages)) == 2
+
+
+def test_compare_extractions():
+    original = {'open_balance': 10, 'ending_balance': 20.5, 'currency': 'CAD',
+                'transactions': [{'amount': 5.25}, {'amount': 5.25}, {'amount': -100}]}
+    assert compare_extractions(original, dict(original))['identical']
+    misread = {**original, 'transactions': [{'amount': 5.25}, {'amount': 5.28}, {'amount': -100}]}
+    result = compare_extractions(original, misread)
+    assert not result['identical']
+    assert result['amount_agreement'] == round(2 / 3, 4)
@@ -0,0 +1,52 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import openomi_logic
+from openomi_logic import get_request_property
+from standins import FakeADE, LatencyModel, LocalS3, make_pdf_bytes
+
+FILE_KEY = 'audit-test-statement.pdf'
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    latency = LatencyModel(0)
+    s3 = LocalS3(latency)
+    s3.put(openomi_logic.BUCKET_NAME, FILE_KEY, make_pdf_bytes(1))
+    monkeypatch.setattr(openomi_logic.engine, 'ade_client', FakeADE(latency))
+    monkeypatch.setattr(openomi_logic.engine, 's3_client', s3)
+    for name in ('RECORD_DIR', 'WAREHOUSE_DIR', 'BASELINES_PATH'):
+        monkeypatch.setattr(openomi_logic, name, None)
+
+
+def _body(response):
+    return json.loads(response['response']['responseBody']['application/json']['body'])
+
+
+def _event(**fields):
+    return {'actionGroup': 'extract', 'apiPath': '/extract_document', 'httpMethod': 'POST', **fields}
+
+
+@pytest.mark.parametrize('event', [
+    _event(requestBody={'content': {'application/json': {'properties': [{'name': 'file_key', 'value': FILE_KEY}]}}}),
+    _event(requestBody={'content': {'application/json': [{'name': 'file_key', 'value': FILE_KEY}]}}),
+    _event(parameters=[{'name': 'file_key', 'value': FILE_KEY}]),
+])
+def test_file_key_found_in_every_event_form(offline, event):
+    body = _body(openomi_logic.lambda_handler(event, SimpleNamespace(aws_request_id='test')))
+    assert 'error' not in body
+    assert body['account_holder'] == 'JANE APPLICANT'
+
+
+def test_missing_file_key(offline):
+    body = _body(openomi_logic.lambda_handler(_event(), SimpleNamespace(aws_request_id='test')))
+    assert body['error'].startswith("Missing 'file_key'")
+
+
+def test_get_request_property_prefers_request_body():
+    event = _event(requestBody={'content': {'application/json': {'properties': [{'name': 'program_code', 'value': 'CEC'}]}}},
+                   parameters=[{'name': 'program_code', 'value': 'PNP'}])
+    assert get_request_property(event, 'program_code') == 'CEC'
+    assert get_request_property(event, 'file_key') is None
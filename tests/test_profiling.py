@@ -0,0 +1,63 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import openomi_profiling
+from openomi_profiling import PROFILE_FLAG, profiled
+
+
+@pytest.fixture
+def profile_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(openomi_profiling, 'PROFILE_DIR', str(tmp_path))
+    return tmp_path
+
+
+@profiled
+def inner(file_key, program_code=None):
+    return sum(range(1000))
+
+
+@profiled
+def handler(event, context):
+    return inner('key', 'FSW-EE')
+
+
+def _summaries(path):
+    return sorted(p.name for p in path.glob('*-summary.json'))
+
+
+def test_requested_handler_profile_uses_request_id(profile_dir):
+    handler({PROFILE_FLAG: 'true'}, SimpleNamespace(aws_request_id='req-42'))
+    [summary] = _summaries(profile_dir)
+    assert '-req-42-handler-' in summary
+
+
+def test_nested_calls_never_sample_on_their_own(profile_dir, monkeypatch):
+    monkeypatch.setattr(openomi_profiling, 'PROFILE_SAMPLE_RATE', 0.5)
+    draws = []
+    monkeypatch.setattr(openomi_profiling.random, 'random', lambda: draws.append(1) or 0.9)
+    for i in range(10):
+        handler({}, SimpleNamespace(aws_request_id=f"req-{i}"))
+    assert len(draws) == 10
+    assert _summaries(profile_dir) == []
+
+
+def test_sample_rate_applies_once_per_invocation(profile_dir, monkeypatch):
+    monkeypatch.setattr(openomi_profiling, 'PROFILE_SAMPLE_RATE', 1.0)
+    handler({}, SimpleNamespace(aws_request_id='req-1'))
+    assert len(_summaries(profile_dir)) == 1
+
+
+def test_direct_calls_can_still_be_sampled(profile_dir, monkeypatch):
+    monkeypatch.setattr(openomi_profiling, 'PROFILE_SAMPLE_RATE', 1.0)
+    inner('key', 'FSW-EE')
+    [summary] = _summaries(profile_dir)
+    assert summary.endswith('-inner-summary.json')
+
+
+def test_max_rss_is_null_without_resource(profile_dir, monkeypatch):
+    monkeypatch.setattr(openomi_profiling, 'resource', None)
+    handler({PROFILE_FLAG: 'true'}, SimpleNamespace(aws_request_id='req-7'))
+    [summary] = profile_dir.glob('*-summary.json')
+    assert json.loads(summary.read_text())['max_rss_mb'] is None
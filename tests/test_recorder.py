@@ -0,0 +1,116 @@
+import hashlib
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import openomi_logic
+import openomi_recorder
+from openomi_recorder import RecordingADE, RecordingS3, redact_event, redact_extraction, redact_text
+from replay import ReplayClients, replay_one
+from standins import FakeADE, LatencyModel, LocalS3, make_agent_event, make_markdown, make_pdf_bytes
+
+HOLDER = 'Jean Dupont'
+COUNTERPARTY = 'Marie Tremblay'
+ADDRESS = '12 Main St'
+ACCOUNT = '1234 5678 9012 3456'
+CARD = '4111-1111-1111-1111'
+FILE_KEY = 'audit-20240101-ab12cd-Jean_Dupont_statement.pdf'
+
+STATEMENT = {
+    'account_holder': HOLDER,
+    'open_balance': 1520.5,
+    'ending_balance': 12170.5,
+    'currency': 'CAD',
+    'transactions': [
+        {'date': 'Jan 02, 2024', 'description': f"E-TRANSFER FROM {COUNTERPARTY} acct {ACCOUNT}, {ADDRESS}",
+         'amount': 10000.0},
+        {'date': '2024-01-05', 'description': f"POS PURCHASE CARD {CARD} METRO {ADDRESS}", 'amount': -49.5},
+        {'date': '2024-01-09', 'description': f"PAYROLL ACME CORP REF 998877665 {HOLDER.upper()}", 'amount': 700.0},
+    ],
+}
+
+SECRETS = [HOLDER, HOLDER.upper(), 'Dupont', COUNTERPARTY, 'Tremblay', ADDRESS, 'Main St', ACCOUNT, '5678', CARD,
+           '4111-1111', '998877665', 'Jean_Dupont', 'Jan 02', 'METRO', 'ACME']
+
+
+@pytest.fixture
+def recorded(monkeypatch, tmp_path):
+    latency = LatencyModel(0)
+    s3 = LocalS3(latency)
+    s3.put(openomi_logic.BUCKET_NAME, FILE_KEY, make_pdf_bytes(2))
+    ade = FakeADE(latency, extraction=STATEMENT)
+    monkeypatch.setattr(openomi_logic.engine, 's3_client', RecordingS3(s3))
+    monkeypatch.setattr(openomi_logic.engine, 'ade_client', RecordingADE(ade))
+    monkeypatch.setattr(openomi_logic, 'RECORD_DIR', str(tmp_path))
+    monkeypatch.setattr(openomi_recorder, 'RECORD_DIR', str(tmp_path))
+    for name in ('WAREHOUSE_DIR', 'BASELINES_PATH'):
+        monkeypatch.setattr(openomi_logic, name, None)
+
+    event = make_agent_event(FILE_KEY, 'FSW-EE', session_id='session-of-jean-dupont')
+    event['inputText'] = f"Audit {HOLDER}, account {ACCOUNT}"
+    openomi_logic.lambda_handler(event, SimpleNamespace(aws_request_id='req-1'))
+    [path] = tmp_path.glob('*.json')
+    return path
+
+
+def test_markdown_really_carries_the_secrets():
+    # Guards the test below: the parse output it records is the full statement text
+    markdown = make_markdown(STATEMENT, 1)
+    assert COUNTERPARTY in markdown and ADDRESS in markdown
+
+
+def test_recording_leaks_no_names_addresses_or_account_digits(recorded):
+    text = recorded.read_text()
+    for secret in SECRETS:
+        assert secret not in text, secret
+
+    record = json.loads(text)
+    parse = next(call for call in record['calls'] if call['op'] == 'parse')
+    assert parse['response']['markdown'].startswith('<redacted markdown')
+    assert record['response_body']['open_balance'] == 1520.5
+    assert [t['amount'] for t in record['response_body']['transactions']] == [10000.0, -49.5, 700.0]
+
+
+def test_redacted_recording_replays(recorded, monkeypatch):
+    record = json.loads(recorded.read_text())
+    record['_file'] = recorded.name
+    clients = ReplayClients()
+    monkeypatch.setattr(openomi_logic.engine, 's3_client', clients)
+    monkeypatch.setattr(openomi_logic.engine, 'ade_client', clients)
+    monkeypatch.setattr(openomi_logic, 'RECORD_DIR', None)
+    _, ok, error = replay_one(clients, record)
+    assert ok, error
+
+
+@pytest.mark.parametrize('text, expected', [
+    (f"acct {ACCOUNT}", 'acct XXXX XXXX XXXX 3456'),
+    (f"card {CARD}", 'card XXXX-XXXX-XXXX-1111'),
+    ('ref 88412', 'ref X8412'),
+    ('amount 1200', 'amount 1200'),
+])
+def test_redact_text_masks_grouped_numbers(text, expected):
+    assert redact_text(text) == expected
+
+
+def test_redaction_is_idempotent():
+    once = redact_extraction(STATEMENT, [HOLDER])
+    assert redact_extraction(once, [HOLDER]) == once
+
+
+def test_redact_event_keeps_structure():
+    event = make_agent_event(FILE_KEY, 'FSW-EE')
+    redacted = redact_event(event)
+    assert redacted['apiPath'] == event['apiPath']
+    assert FILE_KEY not in json.dumps(redacted)
+    assert openomi_logic.get_request_property(redacted, 'file_key').endswith('.pdf')
+
+
+def test_tokens_are_keyed(monkeypatch):
+    monkeypatch.setattr(openomi_recorder, '_TOKEN_KEY', b'deployment-a')
+    token = openomi_recorder.tokenize(HOLDER)
+    assert token == openomi_recorder.tokenize(HOLDER)
+    assert token[4:] != hashlib.sha256(HOLDER.encode('utf-8')).hexdigest()[:12]
+
+    monkeypatch.setattr(openomi_recorder, '_TOKEN_KEY', b'deployment-b')
+    assert openomi_recorder.tokenize(HOLDER) != token
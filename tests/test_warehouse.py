@@ -0,0 +1,95 @@
+from datetime import date
+
+import pytest
+
+import openomi_warehouse as warehouse
+
+
+def _statement(holder, transactions):
+    return {'account_holder': holder, 'currency': 'cad',
+            'transactions': [{'date': d, 'description': desc, 'amount': amount} for d, desc, amount in transactions]}
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / 'warehouse')
+
+
+def _append(root, statement, file_key, day):
+    return warehouse.append_extraction(statement, file_key, ingest_date=date(2024, 1, day), root=root)
+
+
+def _files(root):
+    from pathlib import Path
+    return sorted(str(p.relative_to(root)) for p in Path(root).rglob('*.parquet'))
+
+
+def test_append_then_query(root):
+    written = _append(root, _statement('Alice A', [('2024-01-02', 'E-TRANSFER FROM Jean Dupont #88412', 10000),
+                                                   ('Jan 3, 2024', 'GROCERY', -52.3)]), 'k1', 1)
+    assert written == 2
+    [row] = warehouse.find_counterparty('Interac e-Transfer - JEAN DUPONT', root=root)
+    assert row['file_key'] == 'k1'
+    assert row['amount_cents'] == 1000000 and row['is_round']
+    assert row['txn_date'] == date(2024, 1, 2)
+    [grocery] = warehouse.find_amount(-52.3, date(2024, 1, 3), root=root)
+    assert grocery['counterparty'] == 'GROCERY'
+
+
+def test_same_day_retry_replaces_file(root):
+    _append(root, _statement('Alice A', [('2024-01-02', 'E-TRANSFER FROM Jean Dupont', 10000)]), 'k1', 1)
+    _append(root, _statement('Alice A', [('2024-01-02', 'E-TRANSFER FROM Jean Dupont', 10000)]), 'k1', 1)
+    assert len(_files(root)) == 1
+    assert len(warehouse.find_counterparty('Jean Dupont', root=root)) == 1
+
+
+def test_cross_day_retry_supersedes_rows_that_no_longer_match(root):
+    _append(root, _statement('Alice A', [('2024-01-02', 'E-TRANSFER FROM Jean Dupont', 10000)]), 'k1', 1)
+    _append(root, _statement('Bob B', [('2024-01-02', 'E-TRANSFER FROM Jean Dupont', 10000)]), 'k2', 1)
+    _append(root, _statement('Alice A', [('2024-01-02', 'PAYROLL ACME', 10000)]), 'k1', 2)
+
+    assert [row['file_key'] for row in warehouse.find_counterparty('Jean Dupont', root=root)] == ['k2']
+    assert warehouse.shared_counterparties(root=root) == []
+    assert sorted(row['counterparty'] for row in warehouse.find_amount(10000, root=root)) == ['JEAN DUPONT', 'PAYROLL ACME']
+
+
+def test_compaction_merges_and_drops_superseded_rows(root):
+    _append(root, _statement('Alice A', [('2024-01-02', 'E-TRANSFER FROM Jean Dupont', 10000)]), 'k1', 1)
+    _append(root, _statement('Bob B', [('2024-01-02', 'E-TRANSFER FROM Jean Dupont', 5000)]), 'k2', 1)
+    _append(root, _statement('Carol C', [('2024-01-03', 'RENT', -900)]), 'k3', 2)
+    _append(root, _statement('Alice A', [('2024-01-02', 'PAYROLL ACME', 10000)]), 'k1', 3)
+
+    compacted = warehouse.compact_closed(root=root, before=date(2024, 1, 3))
+    assert len(compacted) == 2
+    files = _files(root)
+    assert [f.split('/')[0] for f in files] == ['ingest_date=2024-01-01', 'ingest_date=2024-01-02', 'ingest_date=2024-01-03']
+    assert files[0] == 'ingest_date=2024-01-01/compacted.parquet'
+    rows = warehouse._dataset(root).to_table().to_pylist()
+    assert sorted((row['file_key'], row['counterparty']) for row in rows) == [
+        ('k1', 'PAYROLL ACME'), ('k2', 'JEAN DUPONT'), ('k3', 'RENT')]
+
+
+def test_compacting_a_fully_superseded_partition_removes_it(root):
+    _append(root, _statement('Alice A', [('2024-01-02', 'E-TRANSFER FROM Jean Dupont', 10000)]), 'k1', 1)
+    _append(root, _statement('Alice A', [('2024-01-02', 'PAYROLL ACME', 10000)]), 'k1', 2)
+    assert warehouse.compact('2024-01-01', root=root) is None
+    assert [f.split('/')[0] for f in _files(root)] == ['ingest_date=2024-01-02']
+
+
+def test_shared_round_amounts(root):
+    for i, holder in enumerate(['Alice A', 'Bob B', 'Carol C']):
+        _append(root, _statement(holder, [('2024-02-01', f"DEPOSIT {holder}", 10000),
+                                          ('2024-02-01', 'ODD', 1234.56)]), f"k{i}", 1)
+    _append(root, _statement('Dan D', [('2024-02-02', 'DEPOSIT', 10000)]), 'k9', 1)
+
+    [shared] = warehouse.shared_round_amounts(min_applicants=3, root=root)
+    assert shared['date'] == '2024-02-01'
+    assert shared['amount'] == 10000.0
+    assert shared['applicants'] == 3
+    assert sorted(shared['applicant_ids']) == ['ALICE A', 'BOB B', 'CAROL C']
+    assert warehouse.shared_round_amounts(min_applicants=2, min_amount=20000, root=root) == []
+
+
+def test_empty_warehouse(root):
+    assert warehouse.find_counterparty('anyone', root=root) == []
+    assert warehouse.shared_counterparties(root=root) == []